@@ -88,6 +88,11 @@ class Physical:
   
   value = magnitude  # Alias for backward compatibility
 
+  @property
+  def units(self):
+    """Returns the units of the quantity (a hashable pint unit)."""
+    return self._quantity.units
+
   def dens_str(self):
     """
     Provide a dense string describing the object, similar to the original class.
@@ -1,18 +1,29 @@
 from si.physical import SI
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple, List
 from tabulate import tabulate
 
-def fmt_time(t: SI, fmt_ps: str = ".2f", fmt_ns: str = ".2f") -> str:
-    """Formats an SI time object into picoseconds or nanoseconds."""
-    t_ps = float(t / SI(1e-12, "s"))
+@lru_cache(maxsize=4096)
+def _fmt_time(magnitude: float, units: Any, fmt_ps: str, fmt_ns: str) -> str:
+    t_ps = float(SI(magnitude * units) / SI(1e-12, "s"))
     
     ps_str = f"{t_ps:{fmt_ps}}"
     ns_str = f"{(t_ps / 1000.0):{fmt_ns}}"
     
     return f"{ps_str} ps" if t_ps < 100.0 else f"{ns_str} ns"
+
+def fmt_time(t: SI, fmt_ps: str = ".2f", fmt_ns: str = ".2f") -> str:
+    """Formats an SI time object into picoseconds or nanoseconds."""
+    # The clock prints the same few times over and over, and the unit
+    # conversion is the costly part, so results are cached by value.
+    return _fmt_time(*_time_key(t), fmt_ps, fmt_ns)
+
+def _time_key(t: SI) -> Tuple[float, Any]:
+    """Hashable stand-in for an SI time (SI objects are not hashable)."""
+    return t.magnitude, t.units
     
-@dataclass
+@dataclass(slots=True)
 class SimulationClock:
     """
     This object specifies all the parameters which define the current time
@@ -50,6 +61,14 @@ class SimulationClock:
     last_step_dt_su: float = 0.0
     last_step_dt_si: SI = field(default_factory=lambda: SI(0.0, "s"))
 
+    # The last rendering of __str__ and the values it was rendered from.
+    _str_key: Optional[Tuple] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _str_cache: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
     # __init__ and __repr__ are GONE (auto-generated)
 
     def inc_stage(self, stage: Optional[int] = None):
@@ -67,6 +86,17 @@ class SimulationClock:
     # This method was updated to use tabulate, the format of the data printed out might
     # look slightly different, but there is a lot less manual formatting code here now.
     def __str__(self) -> str:
+        # tabulate is slow and the clock is often printed unchanged
+        # (e.g. in the progress file), so reuse the last rendering.
+        key = (
+            self.id, self.step, _time_key(self.time),
+            _time_key(self.last_step_dt_si), self.stage, self.stage_step,
+            _time_key(self.stage_time), self.convergence, self.stage_end,
+            self.exit_hysteresis
+        )
+        if key == self._str_key:
+            return self._str_cache
+
         ft = fmt_time
 
         rows = [
@@ -83,4 +113,6 @@ class SimulationClock:
         table = tabulate(rows, tablefmt="pipe")
 
         sep_line = "=" * (len(table.splitlines()[0]))
-        return f"{sep_line}\n{table}\n{sep_line}"
+        self._str_key = key
+        self._str_cache = f"{sep_line}\n{table}\n{sep_line}"
+        return self._str_cache
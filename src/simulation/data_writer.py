@@ -1,16 +1,64 @@
 from __future__ import annotations
+import os
+import queue
+import threading
 import time
 import logging
 import csv
+import weakref
 from pathlib import Path
+import h5py
+import numpy as np
 from typing import (
     List, Optional, Tuple, Dict, Any, Union, Protocol, runtime_checkable
 )
 from si.physical import SI
+from throttler import Throttler
 from simulation.quantity import (Quantity, known_quantities)
 
 log = logging.getLogger('nmag')
 
+# printf-style format used for each ndt column, chosen by Quantity.type.
+# Anything that is not listed is a floating point number, written with
+# str(): the shortest string that reads back as the same float.
+_NDT_FORMATS: Dict[str, str] = {
+    'int': "%d",
+    'date': "%s",
+}
+_NDT_FLOAT_FORMAT = "%s"
+
+# Default number of bytes of formatted rows buffered before they are
+# written out.
+_NDT_BUFFER_SIZE = 1 << 20
+# Seconds after which buffered rows are written out even if the buffer
+# is not full, so that the .ndt file can be followed while running.
+_NDT_FLUSH_INTERVAL = 2.0
+
+# Largest number of mesh entries in one HDF5 chunk of a field snapshot.
+_H5_CHUNK_ENTRIES = 1 << 16
+
+
+def _is_integral(value: Any) -> bool:
+    """Whether "%d" writes the value without truncating it."""
+    return not isinstance(value, float) or value.is_integer()
+
+
+def _write_all(fd: int, buffer: bytearray):
+    """Writes the whole buffer to the file descriptor and empties it."""
+    with memoryview(buffer) as view:
+        written = 0
+        while written < len(view):
+            written += os.write(fd, view[written:])
+    buffer.clear()
+
+
+def _flush_and_close(fd: int, buffer: bytearray):
+    """Finalizer for DataWriter: makes sure no buffered row is lost."""
+    try:
+        _write_all(fd, buffer)
+    finally:
+        os.close(fd)
+
 # Stub the simulation class as a Protocol so we can seperate out the DataWriter from the actual simulation implementation. 
 # This allows us to keep the DataWriter focused on its core responsibilities.
 @runtime_checkable
@@ -31,43 +79,147 @@ class SimulationSource(Protocol):
     
     def get_all_field_names(self) -> List[str]: ...
 
+    # Used to save the fields when get_subfield does not provide the arrays.
     def save_spatial_fields(self, filename: str, fieldnames: List[str]) -> None: ...
 
 class DataWriter:
-    def __init__(self, ndt_filename: Path, h5_filename: Path):
+    """
+    Writes the averages of a simulation to the .ndt file and its spatial
+    fields to the .h5 file.
+
+    Rows are buffered in memory: they reach the .ndt file once buffer_size
+    bytes have accumulated, or with the first save after
+    _NDT_FLUSH_INTERVAL seconds since the last write. So the file lags
+    behind the simulation. Callers must call `flush` (or `close`) whenever
+    the file has to be complete, e.g. before reading it or handing it over.
+    The hysteresis loop flushes at the end of every stage and when it
+    returns. Rows still buffered when the writer is garbage collected or
+    the interpreter exits are written out then, as a last resort.
+    """
+
+    def __init__(self, ndt_filename: Path, h5_filename: Path, rank: int = 0,
+                 buffer_size: int = _NDT_BUFFER_SIZE):
         """
         :param ndt_filename: Path to the tabular output (.ndt).
         :param h5_filename: Path to the spatial output (.h5).
+        :param rank: MPI rank of this process. The averages are already
+            reduced over all ranks, so only rank 0 writes the .ndt file.
+            The other ranks still gather the averages, so that any
+            collective calls made by the source stay matched.
+        :param buffer_size: Number of bytes of rows kept in memory before
+            they are written to the .ndt file. Rows are also written out
+            by flush(), close() and every few seconds.
         """
         self.ndt_filename = ndt_filename
         self.h5_filename = h5_filename
+        self.rank = rank
+        self.buffer_size = buffer_size
         self.quantities = known_quantities
         
         self.quantities_by_name: Dict[str, Quantity] = {
             q.name: q for q in known_quantities
         }
+        # The quantities averaged into .ndt columns, in column order, and
+        # whether each of them is defined per material.
+        self._field_quantities: List[Tuple[Quantity, bool]] = [
+            (q, '?' in (q.signature or ""))
+            for q in self.quantities if q.type in ('field', 'pfield')
+        ]
         
         self._header_written: bool = False
         self._column_names: Optional[List[str]] = None
         self._column_units: Optional[Dict[str, str]] = None
+        self._column_formats: Optional[List[str]] = None
+        # Indices of the "%d" columns, whose values are checked first.
+        self._int_columns: Tuple[int, ...] = ()
+        self._row_template: Optional[str] = None
         self._last_saved_step: int = -1
+        self._localtime_sec: int = -1
+        self._localtime_str: str = ""
+
+        # Rows are formatted into this buffer and written to the .ndt file
+        # with a single os.write once it grows past buffer_size, or
+        # once _NDT_FLUSH_INTERVAL seconds have passed.
+        self._ndt_fd: Optional[int] = None
+        self._ndt_buffer = bytearray()
+        self._ndt_finalizer: Optional[weakref.finalize] = None
+        # Whether the finalizer also runs at interpreter exit. Cleared by
+        # AsyncDataWriter, which closes the writer itself at exit.
+        self._ndt_close_at_exit: bool = True
+        self._flush_throttler = Throttler()
+
+        # Spatial fields are appended to this file, which is kept open.
+        self._h5: Optional[h5py.File] = None
+
+    def _ndt_is_open(self) -> bool:
+        # The finalizer is dead once it has flushed and closed the file,
+        # either through close() or at interpreter exit.
+        return self._ndt_finalizer is not None and self._ndt_finalizer.alive
+
+    def flush(self):
+        """Writes all buffered rows to the .ndt file."""
+        if self._ndt_is_open() and self._ndt_buffer:
+            _write_all(self._ndt_fd, self._ndt_buffer)
+        if self._h5 is not None:
+            self._h5.flush()
+
+    def _open_ndt(self):
+        """Opens the .ndt file for appending the buffered rows."""
+        self._ndt_fd = os.open(self.ndt_filename, os.O_WRONLY | os.O_APPEND)
+        # Flush what is left in the buffer when the writer is garbage
+        # collected or the interpreter exits without calling close().
+        self._ndt_finalizer = weakref.finalize(
+            self, _flush_and_close, self._ndt_fd, self._ndt_buffer
+        )
+        self._ndt_finalizer.atexit = self._ndt_close_at_exit
+        # Start counting the flush interval from now.
+        self._flush_throttler.is_allowed('ndt_flush', 0.0)
+
+    def close(self):
+        """Flushes the buffered rows and closes the .ndt and .h5 files."""
+        if self._ndt_finalizer is not None:
+            # Calling the finalizer flushes and closes the file exactly once.
+            self._ndt_finalizer()
+            self._ndt_finalizer = None
+            self._ndt_fd = None
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
 
     def save(self, 
              source: SimulationSource, 
              fields: Optional[Union[str, List[str]]] = None, 
              avoid_same_step: bool = False):
         
-        current_step = source.step
-        if avoid_same_step and current_step == self._last_saved_step:
+        row = self._take_row(source, avoid_same_step)
+        if row is None:
             return
-        
-        self._last_saved_step = current_step
 
-        self._write_ndt_row(source)
+        self._write_ndt_row(*row)
 
         if fields is not None:
             self._trigger_field_save(source, fields)
 
+    def _take_row(self,
+                  source: SimulationSource,
+                  avoid_same_step: bool = False
+                  ) -> Optional[Tuple[str, List[Tuple[str, Any]], List[Quantity]]]:
+        """Gathers the data of a new .ndt row from the source.
+
+        Returns None if the row should not be saved because the step
+        has not changed since the last save and `avoid_same_step` is set.
+        Otherwise returns the arguments for `_write_ndt_row`, which only
+        depend on the values read here and not on the source.
+        """
+        current_step = source.step
+        if avoid_same_step and current_step == self._last_saved_step:
+            return None
+        
+        self._last_saved_step = current_step
+
+        columns, quantities = self._gather_data(source)
+        return source.name, columns, quantities
+
     def _trigger_field_save(self, source: SimulationSource, fields: Union[str, List[str]]):
         field_names_to_save: List[str] = []
         
@@ -78,16 +230,100 @@ class DataWriter:
         else:
             raise ValueError(f"Invalid fields argument: {fields}")
 
-        if field_names_to_save:
+        if not field_names_to_save:
+            return
+
+        arrays = self._get_field_arrays(source, field_names_to_save)
+        if arrays is None:
             source.save_spatial_fields(
                 filename=str(self.h5_filename),
                 fieldnames=field_names_to_save
             )
+        elif self.rank == 0:
+            self._append_fields(source, arrays)
+
+    def _get_field_arrays(self, source: SimulationSource,
+                          field_names: List[str]
+                          ) -> Optional[List[Tuple[str, np.ndarray]]]:
+        """Reads the subfields making up the given fields from the source.
+
+        Returns None if the source does not provide the arrays, or fails
+        to read one of them, in which case the fields are saved by the
+        source itself. Names the source does not know as fields (such as
+        the subfield name 'm_Py') are read as they are.
+        """
+        get_subfield = getattr(source, 'get_subfield', None)
+        if get_subfield is None:
+            return None
+
+        arrays: List[Tuple[str, np.ndarray]] = []
+        for field_name in field_names:
+            try:
+                mats = source.get_materials_of_field(field_name)
+            except KeyError:
+                mats = []
+            subfield_names = ([f"{field_name}_{mat.name}" for mat in mats]
+                              or [field_name])
+            for subfield_name in subfield_names:
+                try:
+                    data = get_subfield(subfield_name)
+                except Exception:
+                    return None
+                if data is None:
+                    return None
+                arrays.append((subfield_name, np.asarray(data)))
+        return arrays
+
+    def _append_fields(self, source: SimulationSource,
+                       arrays: List[Tuple[str, np.ndarray]]):
+        """Appends a snapshot of each subfield to the .h5 file.
+
+        Each subfield has a group /fields/<name> holding an extendable
+        dataset 'data' with one snapshot per row, and 'step' and 'time'
+        datasets saying when each snapshot was taken.
+        """
+        if self._h5 is None:
+            self._h5 = h5py.File(self.h5_filename, 'a', libver='latest')
+
+        # Snapshots are written by plain assignment, so HDF5 runs the
+        # shuffle and gzip filters itself. Writing the chunks directly
+        # (write_direct_chunk) would mean compressing them by hand here.
+
+        t = source.time
+        t = t.magnitude if isinstance(t, SI) else t
+        for name, data in arrays:
+            group = self._h5.require_group(f"fields/{name}")
+            if 'data' not in group:
+                chunks = (1,) + tuple(
+                    min(n, _H5_CHUNK_ENTRIES) if i == 0 else n
+                    for i, n in enumerate(data.shape)
+                )
+                group.create_dataset(
+                    'data', shape=(0,) + data.shape, dtype=data.dtype,
+                    maxshape=(None,) + data.shape, chunks=chunks,
+                    compression='gzip', compression_opts=1, shuffle=True
+                )
+                group.create_dataset('step', shape=(0,), dtype='i8',
+                                     maxshape=(None,), chunks=(1024,))
+                group.create_dataset('time', shape=(0,), dtype='f8',
+                                     maxshape=(None,), chunks=(1024,))
+
+            n = group['data'].shape[0]
+            for key, value in (('data', data), ('step', source.step),
+                               ('time', t)):
+                dataset = group[key]
+                dataset.resize(n + 1, axis=0)
+                dataset[n] = value
 
     def _gather_data(self, source: SimulationSource) -> Tuple[List[Tuple[str, Any]], List[Quantity]]:
-        lt = time.localtime()
-        lt_str = (f"{lt[0]:04d}/{lt[1]:02d}/{lt[2]:02d}-"
-                  f"{lt[3]:02d}:{lt[4]:02d}:{lt[5]:02d}")
+        now = time.time()
+        now_sec = int(now)
+        # The local time string only changes once per second.
+        if now_sec != self._localtime_sec:
+            self._localtime_sec = now_sec
+            self._localtime_str = time.strftime(
+                "%Y/%m/%d-%H:%M:%S", time.localtime(now_sec)
+            )
 
         columns: List[Tuple[str, Any]] = [
             ('id', source.id),
@@ -97,8 +333,8 @@ class DataWriter:
             ('time', source.time),
             ('stage_time', source.stage_time),
             ('real_time', source.real_time),
-            ('unixtime', SI(time.time(), 's')),
-            ('localtime', lt_str)
+            ('unixtime', SI(now, 's')),
+            ('localtime', self._localtime_str)
         ]
         
         current_quantities: List[Quantity] = [
@@ -121,40 +357,79 @@ class DataWriter:
                 columns.append((prefix, avg))
                 current_quantities.append(quantity.sub_quantity(prefix))
 
-        for quantity in self.quantities:
+        for quantity, per_material in self._field_quantities:
             field_name = quantity.name
-            if quantity.type in ['field', 'pfield']:
-                if '?' in (quantity.signature or ""):
-                    # Assume the objects returned here have a .name attribute
+            if per_material:
+                # Assume the objects returned here have a .name attribute
+                try:
                     mats = source.get_materials_of_field(field_name)
-                    for material in mats:
-                        prefix = f"{field_name}_{material.name}"
-                        process_subfield(field_name, prefix, quantity, mat_name=material.name)
-                else:
-                    process_subfield(field_name, field_name, quantity)
+                except KeyError:
+                    continue
+                for material in mats:
+                    prefix = f"{field_name}_{material.name}"
+                    process_subfield(field_name, prefix, quantity, mat_name=material.name)
+            else:
+                process_subfield(field_name, field_name, quantity)
 
         return columns, current_quantities
 
-    def _write_ndt_row(self, source: SimulationSource):
-        columns, quantities = self._gather_data(source)
-        row_data_dict = dict(columns)
+    def _format_row_by_name(self, row_data: Dict[str, Any]) -> str:
+        """Formats a row cell by cell, by column name.
+
+        Used when the columns don't match the header, or when a value
+        cannot go through the row template. Columns missing from
+        `row_data` or set to None are left empty, and values the column
+        format doesn't accept (or would truncate) are written with str().
+        """
+        row_values = []
+        for fmt, name in zip(self._column_formats, self._column_names):
+            value = row_data.get(name)
+            if value is None:
+                row_values.append("")
+                continue
+
+            if isinstance(value, SI):
+                value = value.magnitude
+
+            if fmt == "%d" and not _is_integral(value):
+                row_values.append(str(value))
+                continue
+            try:
+                row_values.append(fmt % value)
+            except (TypeError, ValueError):
+                row_values.append(str(value))
+
+        return "\t".join(row_values) + "\n"
+
+    def _write_ndt_row(self,
+                       sim_name: str,
+                       columns: List[Tuple[str, Any]],
+                       quantities: List[Quantity]):
+        if self.rank != 0:
+            return
 
         if not self._header_written:
             col_names = []
             col_units = {}
+            col_formats = []
             
             for (name, _), qty in zip(columns, quantities):
                 col_names.append(name)
-                if qty.units:
-                    col_units[name] = qty.units.dens_str()
-                else:
-                    col_units[name] = "-"
+                col_units[name] = qty.units_str
+                col_formats.append(
+                    _NDT_FORMATS.get(qty.type, _NDT_FLOAT_FORMAT)
+                )
             
             self._column_names = col_names
             self._column_units = col_units
+            self._column_formats = col_formats
+            self._int_columns = tuple(
+                i for i, fmt in enumerate(col_formats) if fmt == "%d"
+            )
+            self._row_template = "\t".join(col_formats) + "\n"
             
             with open(self.ndt_filename, 'w', newline='', encoding='utf-8') as f:
-                 f.write(f"# Simulation: {source.name}\n")
+                 f.write(f"# Simulation: {sim_name}\n")
                  
                  writer = csv.writer(f, delimiter='\t')
                  writer.writerow(self._column_names)
@@ -165,15 +440,169 @@ class DataWriter:
             log.error("Column names not initialized.")
             return
 
-        row_values = []
-        for name in self._column_names:
-            value = row_data_dict.get(name)
-            
-            if isinstance(value, SI):
-                value = value.magnitude
-            
-            row_values.append(value)
+        # In the steady state the gathered columns come out in the same
+        # order as the header, so the whole row is formatted in one go with
+        # the template built with the header. Only fall back to a lookup
+        # by name, cell by cell, when the columns differ or a value does
+        # not fit the template (None, not a number where one is due, or a
+        # fraction in an integer column).
+        row = None
+        if len(columns) == len(self._column_names) and all(
+            name == col_name
+            for (name, _), col_name in zip(columns, self._column_names)
+        ):
+            values = tuple(
+                value.magnitude if isinstance(value, SI) else value
+                for _, value in columns
+            )
+            if not any(value is None for value in values) and all(
+                _is_integral(values[i]) for i in self._int_columns
+            ):
+                try:
+                    row = self._row_template % values
+                except (TypeError, ValueError):
+                    pass
+        if row is None:
+            row = self._format_row_by_name(dict(columns))
         
-        with open(self.ndt_filename, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f, delimiter='\t')
-            writer.writerow(row_values)
+        if not self._ndt_is_open():
+            self._open_ndt()
+
+        self._ndt_buffer += row.encode('utf-8')
+        if (len(self._ndt_buffer) >= self.buffer_size
+                or self._flush_throttler.is_allowed('ndt_flush',
+                                                    _NDT_FLUSH_INTERVAL)):
+            self.flush()
+
+
+def _run_writer_thread(tasks: queue.Queue,
+                       writer: DataWriter,
+                       lock: threading.Lock,
+                       errors: List[BaseException]):
+    """Body of the AsyncDataWriter thread: writes queued rows in order."""
+    while True:
+        row = tasks.get()
+        try:
+            if row is None:
+                return
+            # After a failure, drop the remaining rows rather than writing
+            # a table with holes in it. The error is raised in the caller.
+            if not errors:
+                with lock:
+                    writer._write_ndt_row(*row)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            tasks.task_done()
+
+
+def _stop_writer_thread(tasks: queue.Queue,
+                        thread: threading.Thread,
+                        writer: DataWriter):
+    """Finalizer for AsyncDataWriter: drains the queue and closes files."""
+    tasks.put(None)
+    thread.join()
+    writer.close()
+
+
+class AsyncDataWriter:
+    """
+    Wraps a DataWriter so that .ndt rows are written by a background thread.
+
+    The averages of a row are read from the source synchronously in `save`,
+    so the row reflects the state of the simulation at the time of the
+    call. Formatting the row and writing it to disk is then left to a
+    single worker thread, which keeps the rows in order, and `save`
+    returns without waiting for the file system.
+
+    Spatial fields are still saved synchronously, since they are read from
+    the live state of the source. The worker and the field saves share a
+    lock, since h5py is not safe for concurrent writers.
+
+    An exception raised by the worker is re-raised by the next call
+    to `save`, `flush` or `close`. As with DataWriter, rows are only
+    guaranteed to be in the .ndt file after `flush` or `close`, which
+    wait for the queue to drain. Otherwise queued rows are written out
+    when the object is garbage collected or at interpreter exit.
+
+    The wrapper owns the shutdown of the wrapped writer: at exit it first
+    drains the queue and stops the worker, and only then closes the
+    writer. The writer's own exit finalizer is disabled, since it would
+    otherwise write the buffer while the worker is still appending to it.
+    """
+
+    def __init__(self, writer: DataWriter):
+        """
+        :param writer: The DataWriter doing the actual output.
+        """
+        self.writer = writer
+        writer._ndt_close_at_exit = False
+        if writer._ndt_finalizer is not None:
+            writer._ndt_finalizer.atexit = False
+        self._tasks: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._errors: List[BaseException] = []
+
+        # The thread does not reference self, so that the finalizer can
+        # run when this object is garbage collected.
+        self._thread = threading.Thread(
+            target=_run_writer_thread,
+            args=(self._tasks, writer, self._lock, self._errors),
+            name="nmag-data-writer",
+            daemon=True
+        )
+        self._thread.start()
+        self._finalizer = weakref.finalize(
+            self, _stop_writer_thread, self._tasks, self._thread, writer
+        )
+
+    @property
+    def ndt_filename(self) -> Path:
+        return self.writer.ndt_filename
+
+    @property
+    def h5_filename(self) -> Path:
+        return self.writer.h5_filename
+
+    def _raise_pending_error(self):
+        if self._errors:
+            raise RuntimeError(
+                f"Writing to '{self.writer.ndt_filename}' failed"
+            ) from self._errors[0]
+
+    def save(self,
+             source: SimulationSource,
+             fields: Optional[Union[str, List[str]]] = None,
+             avoid_same_step: bool = False):
+        """Queues a row of averages and saves the requested fields.
+
+        Takes the same arguments as `DataWriter.save`. Once the writer
+        has been closed, rows are written synchronously.
+        """
+        self._raise_pending_error()
+
+        if not self._finalizer.alive:
+            self.writer.save(source, fields, avoid_same_step)
+            return
+
+        row = self.writer._take_row(source, avoid_same_step)
+        if row is None:
+            return
+
+        self._tasks.put(row)
+
+        if fields is not None:
+            with self._lock:
+                self.writer._trigger_field_save(source, fields)
+
+    def flush(self):
+        """Waits for the queued rows to be written and flushes the file."""
+        self._tasks.join()
+        self._raise_pending_error()
+        with self._lock:
+            self.writer.flush()
+
+    def close(self):
+        """Writes all queued rows, stops the worker and closes the file."""
+        self._finalizer()
+        self._raise_pending_error()
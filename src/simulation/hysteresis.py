@@ -60,23 +60,45 @@ def _string_normalise(
         'save  fields' --> 'save_fields'
         'Save_Fields'  --> 'save_fields'
     """
-    ns = s
-    if lower:
-        ns = s.lower()
+    ns = s.lower() if lower else s
     if spaces is not None:
-        ns = re.sub(_subsequent_spaces, spaces, ns)
+        ns = _subsequent_spaces.sub(spaces, ns)
     return ns
 
+def _split_predefined(
+    predefined: Dict[str, Callable]
+) -> Dict[str, Dict[str, Callable]]:
+    """
+    Groups the predefined actions by prefix, so that e.g.
+    {'save_averages': f, 'do_next_stage': g} becomes
+    {'save': {'averages': f}, 'do': {'next_stage': g}}.
+    """
+    split: Dict[str, Dict[str, Callable]] = {}
+    for key, action in predefined.items():
+        prefix, sep, name = key.partition('_')
+        if sep:
+            split.setdefault(prefix, {})[name] = action
+    return split
+
 def _append_x_list(
     target_list: List[Tuple[Callable, Any]],
     input_list: List[Tuple],
     prefix: str = "",
-    predefined_actions: Dict[str, Callable] = {}
+    predefined_actions: Dict[str, Callable] = {},
+    actions: Optional[Dict[str, Callable]] = None
 ):
     """
     Internally used by `_join_save_and_do_lists` to parse the
     multi-argument 'save' and 'do' tuples.
+
+    ``actions`` are the predefined actions for ``prefix`` as returned
+    by `_split_predefined`; they are computed here if not given.
     """
+    if actions is None:
+        actions = _split_predefined(predefined_actions).get(
+            _string_normalise(prefix), {}
+        )
+
     try:
         for tuple_item in input_list:
             list_item = list(tuple_item)
@@ -92,18 +114,18 @@ def _append_x_list(
                     continue
 
                 if isinstance(thing, str):
-                    normalised_thing = _string_normalise(f"{prefix} {thing}")
-                    if normalised_thing in predefined_actions:
+                    normalised_thing = _string_normalise(thing)
+                    # Same as normalising f"{prefix} {thing}" and looking
+                    # it up in predefined_actions.
+                    name = normalised_thing.lstrip('_')
+                    if name in actions:
+                        target_list.append((actions[name], when))
+                        continue
+                    elif normalised_thing in predefined_actions:
+                        # Try without prefix
                         action = predefined_actions[normalised_thing]
                         target_list.append((action, when))
                         continue
-                    else:
-                        # Try without prefix
-                        normalised_thing = _string_normalise(thing)
-                        if normalised_thing in predefined_actions:
-                            action = predefined_actions[normalised_thing]
-                            target_list.append((action, when))
-                            continue
 
                 # If we are here, the 'thing' is not a callable and not
                 # a recognized string.
@@ -142,10 +164,13 @@ def _join_save_and_do_lists(
     # Note: It is important to process 'do' before 'save'.
     # A 'do' command might be 'next_stage', and 'save' commands
     # need to know if this is the last step of the stage.
+    split_actions = _split_predefined(predefined_actions)
     _append_x_list(joint_list, do_list, prefix="do",
-                   predefined_actions=predefined_actions)
+                   predefined_actions=predefined_actions,
+                   actions=split_actions.get("do", {}))
     _append_x_list(joint_list, save_list, prefix="save",
-                   predefined_actions=predefined_actions)
+                   predefined_actions=predefined_actions,
+                   actions=split_actions.get("save", {}))
 
     # XXX Matteo, can we at this point order the save_ entries such that
     # the save_restart is the last? See my explanation in ticket:169.
@@ -301,91 +326,110 @@ def simulation_hysteresis(
         stage = self.clock.stage
         self.clock.exit_hysteresis = False
         
-        for H_ext in H_ext_list[stage-1:]:
-            log.info(f"hysteresis: starting new stage: field = {str(H_ext)}")
-            self.do_next_stage(stage=stage)
-            stage = None  # Next time, just increase the stage counter
-            self.clock.stage_end = False
-            if H_ext:
-                self.set_H_ext(H_ext)
-            self.reinitialise(initial_time=0)
-
-            # Update schedule for when to save what
-            for what, when in thing_when_tuples:
-                key = str(what)
-                next_save_time[key] = my_next_time(when, self.clock)
-                log.debug(f"hysteresis: will save {what} at {next_save_time[key]}")
-
-            # --- Main Stage Loop ---
-            while True:
-                self.clock.stage_end = converged = self.is_converged()
-                log.debug(f"hysteresis loop, stage {self.clock.stage}, "
-                          f"converged = {converged}")
-
-                # Find out the next time we need to check for convergence
-                deltas = my_next_deltas(convergence_check, self.clock)
-                log.debug(f"Time to next event: deltas = {deltas}")
-
-                # Check what needs to be saved/done
+        # Rows are buffered and written by a background thread: make sure
+        # they are all in the .ndt file when the loop is over, however it
+        # ends (last stage, 'exit' or an error). When it ends with an
+        # error, a failure to flush must not hide that error.
+        failed = False
+        try:
+            for H_ext in H_ext_list[stage-1:]:
+                log.info(f"hysteresis: starting new stage: field = {str(H_ext)}")
+                self.do_next_stage(stage=stage)
+                stage = None  # Next time, just increase the stage counter
+                self.clock.stage_end = False
+                if H_ext:
+                    self.set_H_ext(H_ext)
+                self.reinitialise(initial_time=0)
+
+                # Update schedule for when to save what
                 for what, when in thing_when_tuples:
                     key = str(what)
-                    time_matches = when.match_time(self.clock)
-                    nst = my_next_time(when, self.clock)
-
-                    # Check if the event is scheduled to run now
-                    if time_matches or nst != next_save_time[key]:
-                        log.debug(
-                            f"hysteresis: analysing {what}: time planned "
-                            f"for saving was {next_save_time[key]}, "
-                            f"now is {nst}. Matching? {time_matches}"
-                        )
-                        log.info(
-                            f"hysteresis: saving {what} at id={self.clock.id},"
-                            f"step={self.clock.step}.\n{self.clock}"
-                        )
-                        what(self) # Run the action/save function
-
-                    next_save_time[key] = nst
-                    deltas = my_next_deltas(when, self.clock, suggest=deltas)
-
-                (delta_step, delta_time, delta_real_time) = deltas
-                log.debug(f"hysteresis: current time is {self.clock.time}")
-                log.debug(
-                    f"predicted advance: delta_step={delta_step}, "
-                    f"delta_time={delta_time}, "
-                    f"delta_real_time={delta_real_time}"
-                )
-
-                if delta_time is None:
-                    target_time = self.max_time_reached
-                else:
-                    target_time = self.clock.stage_time + delta_time
+                    next_save_time[key] = my_next_time(when, self.clock)
+                    log.debug(f"hysteresis: will save {what} at {next_save_time[key]}")
+
+                # --- Main Stage Loop ---
+                while True:
+                    self.clock.stage_end = converged = self.is_converged()
+                    log.debug(f"hysteresis loop, stage {self.clock.stage}, "
+                              f"converged = {converged}")
+
+                    # Find out the next time we need to check for convergence
+                    deltas = my_next_deltas(convergence_check, self.clock)
+                    log.debug(f"Time to next event: deltas = {deltas}")
+
+                    # Check what needs to be saved/done
+                    for what, when in thing_when_tuples:
+                        key = str(what)
+                        time_matches = when.match_time(self.clock)
+                        nst = my_next_time(when, self.clock)
+
+                        # Check if the event is scheduled to run now
+                        if time_matches or nst != next_save_time[key]:
+                            log.debug(
+                                f"hysteresis: analysing {what}: time planned "
+                                f"for saving was {next_save_time[key]}, "
+                                f"now is {nst}. Matching? {time_matches}"
+                            )
+                            log.info(
+                                f"hysteresis: saving {what} at id={self.clock.id},"
+                                f"step={self.clock.step}.\n{self.clock}"
+                            )
+                            what(self) # Run the action/save function
+
+                        next_save_time[key] = nst
+                        deltas = my_next_deltas(when, self.clock, suggest=deltas)
+
+                    (delta_step, delta_time, delta_real_time) = deltas
+                    log.debug(f"hysteresis: current time is {self.clock.time}")
+                    log.debug(
+                        f"predicted advance: delta_step={delta_step}, "
+                        f"delta_time={delta_time}, "
+                        f"delta_real_time={delta_real_time}"
+                    )
+
+                    if delta_time is None:
+                        target_time = self.max_time_reached
+                    else:
+                        target_time = self.clock.stage_time + delta_time
 
-                delta_step = delta_step if delta_step is not None else -1
+                    delta_step = delta_step if delta_step is not None else -1
 
-                if self.clock.exit_hysteresis:
-                    log.debug("Exit from the hysteresis loop has been forced "
-                              "using the tag 'exit': exiting now!")
-                    return
+                    if self.clock.exit_hysteresis:
+                        log.debug("Exit from the hysteresis loop has been forced "
+                                  "using the tag 'exit': exiting now!")
+                        return
 
-                if self.clock.stage_end:
-                    log.debug(f"Reached end of stage in hysteresis command, "
-                              f"converged={converged}, exiting now!")
-                    break
+                    if self.clock.stage_end:
+                        log.debug(f"Reached end of stage in hysteresis command, "
+                                  f"converged={converged}, exiting now!")
+                        break
 
-                log.debug(f"About to call advance time with target_time={target_time} "
-                          f"and max_it={delta_step}")
+                    log.debug(f"About to call advance time with target_time={target_time} "
+                              f"and max_it={delta_step}")
                 
-                time_reached = self.advance_time(target_time, max_it=delta_step)
+                    time_reached = self.advance_time(target_time, max_it=delta_step)
                 
-                if time_reached > 0.99 * self.max_time_reached:
-                    msg = (f"Simulation time reached {self.max_time_reached}: "
-                           "are you starting from a zero torque configuration?")
-                    raise RuntimeError(msg)
-
-                # Write progress data to file
-                _update_progress_file(self, H_ext, progress_file_name,
-                                      progress_message_minimum_delay)
+                    if time_reached > 0.99 * self.max_time_reached:
+                        msg = (f"Simulation time reached {self.max_time_reached}: "
+                               "are you starting from a zero torque configuration?")
+                        raise RuntimeError(msg)
+
+                    # Write progress data to file
+                    _update_progress_file(self, H_ext, progress_file_name,
+                                          progress_message_minimum_delay)
             
-            # --- End of Main Stage Loop ---
-        # --- End of H_ext_list Loop ---
+                # --- End of Main Stage Loop ---
+
+                # The .ndt file is complete at the end of every stage.
+                self.writer.flush()
+            # --- End of H_ext_list Loop ---
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            try:
+                self.writer.flush()
+            except Exception:
+                if not failed:
+                    raise
+                log.exception("hysteresis: could not flush the data writer")
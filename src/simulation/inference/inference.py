@@ -1,6 +1,7 @@
 import logging
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 log = logging.getLogger('nmagmake')
 
@@ -22,7 +23,9 @@ class InferenceEngine:
                 self.entities[ie.name] = ie
         
         self._build_backlinks()
-        self._check_for_cycles()
+        # Entity names ordered so that dependencies come first.
+        self._order: List[str] = self._sort_dependencies_first()
+        self._downstream: Dict[str, Tuple[str, ...]] = self._find_downstream()
 
     def _build_backlinks(self) -> None:
         """Connects dependencies to their dependents and validates existence."""
@@ -32,43 +35,70 @@ class InferenceEngine:
                     raise KeyError(f"Dependency '{dep}' required by '{name}' not found.")
                 ie_dep._is_prerequisite.append(name)
 
-    def _check_for_cycles(self) -> None:
-        """Detects circular dependencies using DFS to prevent infinite recursion."""
-        visited: Set[str] = set()
-        rec_stack: Set[str] = set()
-
-        def has_cycle(name: str) -> bool:
-            visited.add(name)
-            rec_stack.add(name)
-
-            for neighbor in self.entities[name].depends_on:
-                if neighbor not in visited:
-                    if has_cycle(neighbor):
-                        return True
-                elif neighbor in rec_stack:
-                    return True
-
-            rec_stack.remove(name)
-            return False
-
-        for node in self.entities:
-            if node not in visited:
-                if has_cycle(node):
-                    raise ValueError(f"Circular dependency detected involving '{node}'")
+    def _sort_dependencies_first(self) -> List[str]:
+        """Orders the entities topologically (Kahn's algorithm).
+
+        Entities left out of the order are part of, or depend on, a
+        circular dependency, which is reported as an error.
+        """
+        remaining = {name: len(ie.depends_on) for name, ie in self.entities.items()}
+        ready = deque(name for name, n in remaining.items() if n == 0)
+        order: List[str] = []
+
+        while ready:
+            name = ready.popleft()
+            order.append(name)
+            for dependent_name in self.entities[name]._is_prerequisite:
+                remaining[dependent_name] -= 1
+                if remaining[dependent_name] == 0:
+                    ready.append(dependent_name)
+
+        if len(order) < len(self.entities):
+            node = next(name for name, n in remaining.items() if n > 0)
+            raise ValueError(f"Circular dependency detected involving '{node}'")
+        return order
+
+    def _find_downstream(self) -> Dict[str, Tuple[str, ...]]:
+        """For each entity, lists it and all the entities depending on it,
+        directly or not, with dependencies first."""
+        position = {name: i for i, name in enumerate(self._order)}
+        downstream: Dict[str, Tuple[str, ...]] = {}
+        for name in self.entities:
+            found = {name}
+            pending = [name]
+            while pending:
+                for dependent_name in self.entities[pending.pop()]._is_prerequisite:
+                    if dependent_name not in found:
+                        found.add(dependent_name)
+                        pending.append(dependent_name)
+            downstream[name] = tuple(sorted(found, key=position.__getitem__))
+        return downstream
 
     def invalidate(self, name: str) -> None:
-        """Recursively marks an entity and its dependents as dirty."""
+        """Marks an entity and its dependents as dirty.
+
+        The invalidation spreads from the entity to its dependents through
+        entities which are up-to-date: a dirty entity already has its own
+        dependents marked, or about to be rebuilt.
+        """
         if (ie := self.entities.get(name)) is None:
             raise KeyError(f"Entity '{name}' is unknown.")
 
-        if ie._is_uptodate:
-            ie._is_uptodate = False
-            log.debug(f"Invalidated: {name}")
-            for dependent_name in ie._is_prerequisite:
-                self.invalidate(dependent_name)
+        if not ie._is_uptodate:
+            return
+
+        invalidated: Set[str] = set()
+        for dependent_name in self._downstream[name]:
+            dependent = self.entities[dependent_name]
+            if dependent._is_uptodate and (
+                    dependent_name == name
+                    or any(dep in invalidated for dep in dependent.depends_on)):
+                dependent._is_uptodate = False
+                invalidated.add(dependent_name)
+                log.debug(f"Invalidated: {dependent_name}")
 
     def make(self, name: str, **make_args: Any) -> None:
-        """Builds target and dependencies recursively."""
+        """Builds target and its dependencies, dependencies first."""
         if (ie := self.entities.get(name)) is None:
             raise KeyError(f"Cannot build unknown entity '{name}'.")
 
@@ -76,10 +106,26 @@ class InferenceEngine:
             log.debug(f"'{name}' is up-to-date.")
             return
 
-        for dep_name in ie.depends_on:
-            self.make(dep_name, **make_args)
-
-        log.info(f"Building: {name}")
+        # Depth-first traversal without recursion. Each entry is an entity
+        # to build and an iterator over the dependencies still to visit.
+        stack = [(ie, iter(ie.depends_on))]
+        while stack:
+            ie, deps = stack[-1]
+            dep_name = next(deps, None)
+            if dep_name is not None:
+                dep = self.entities[dep_name]
+                if dep._is_uptodate:
+                    log.debug(f"'{dep_name}' is up-to-date.")
+                else:
+                    stack.append((dep, iter(dep.depends_on)))
+                continue
+
+            stack.pop()
+            self._build(ie, make_args)
+
+    def _build(self, ie: InferenceEntity, make_args: Dict[str, Any]) -> None:
+        """Runs the steps making an entity and marks it up-to-date."""
+        log.info(f"Building: {ie.name}")
         for step in ie.how_to_make:
             step(**make_args)
 
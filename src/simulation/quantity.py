@@ -1,8 +1,9 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from typing import Optional, List, Dict
 from si.physical import SI 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Quantity:
     """A dataclass describing a physical quantity for data saving.
     
@@ -18,21 +19,51 @@ class Quantity:
     signature: Optional[str] = None
     context: Optional[str] = None
     parent: Optional['Quantity'] = None
+    # Dense units string used in ndt headers, computed once at construction.
+    units_str: str = field(init=False, repr=False, compare=False)
+    # Sub-quantities already created from this one, keyed by name.
+    _sub_quantities: Dict[str, 'Quantity'] = field(
+        init=False, repr=False, compare=False, default_factory=dict
+    )
 
     def __post_init__(self):
+        # Interned so that lookups in the by-name tables, and comparisons
+        # of type/signature/context, hit the fast path.
+        object.__setattr__(self, 'name', sys.intern(self.name))
+        object.__setattr__(self, 'type', sys.intern(self.type))
         if self.signature is None:
             object.__setattr__(self, 'signature', self.name)
+        else:
+            object.__setattr__(self, 'signature', sys.intern(self.signature))
+        if self.context is not None:
+            object.__setattr__(self, 'context', sys.intern(self.context))
+
+        if self.units is None:
+            units_str = "-"
+        elif self.parent is not None and self.parent.units is self.units:
+            units_str = self.parent.units_str
+        else:
+            units_str = self.units.dens_str()
+        object.__setattr__(self, 'units_str', units_str)
 
     def sub_quantity(self, name: str) -> 'Quantity':
-        """Creates a new Quantity representing a sub-component."""
-        return self.__class__(
-            name=name,
-            type=self.type,
-            units=self.units,
-            signature=self.signature,
-            context=self.context,
-            parent=self
-        )
+        """Returns the Quantity representing a sub-component.
+
+        Sub-quantities are immutable, so the one created for a given name
+        is cached and returned again on subsequent calls.
+        """
+        sub = self._sub_quantities.get(name)
+        if sub is None:
+            sub = self.__class__(
+                name=name,
+                type=self.type,
+                units=self.units,
+                signature=self.signature,
+                context=self.context,
+                parent=self
+            )
+            self._sub_quantities[name] = sub
+        return sub
 
 known_quantities: List[Quantity] = [
     #         name                 type       unit           signature context
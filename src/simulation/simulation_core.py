@@ -13,6 +13,8 @@ SimulationCore ---|                       |---> Simulation
 from __future__ import annotations
 from abc import ABC, abstractmethod
 import logging
+import os
+from operator import methodcaller
 from pathlib import Path
 from typing import (
     Any, Callable, Dict, List, Optional, Tuple, Sequence, Union
@@ -27,7 +29,7 @@ from quantity import (
 )
 import hysteresis as hysteresis_m
 from mock_features import MockFeatures
-from data_writer import DataWriter
+from data_writer import AsyncDataWriter, DataWriter
 
 # This is a temporary stub to replace nsim.setup.get_features()
 # until the full setup module is ported.
@@ -35,6 +37,31 @@ features = MockFeatures()
 
 log = logging.getLogger('nmag')
 
+def _existing_files(paths: List[Path]) -> List[Path]:
+    """
+    Returns the paths which exist, listing each directory only once
+    rather than probing every path with its own stat call.
+    """
+    listings: Dict[Path, set] = {}
+    existing = []
+    for path in paths:
+        names = listings.get(path.parent)
+        if names is None:
+            try:
+                with os.scandir(path.parent) as entries:
+                    names = {entry.name for entry in entries}
+            except FileNotFoundError:
+                names = set()
+            listings[path.parent] = names
+        if path.name in names:
+            existing.append(path)
+    return existing
+
+def _save_restart(sim: SimulationCore):
+    # Make sure the .ndt file is up to date with the restart file.
+    sim.writer.flush()
+    sim.save_restart_file()
+
 class SimulationCore(ABC):
     """
     Abstract base class for simulations.
@@ -50,7 +77,8 @@ class SimulationCore(ABC):
 
         self.class_id: str = sim_id # String identifying the kind of Simulation class
         self.units: Optional[Any] = None # Simulation units used by this class
-        self.do_demag: bool = do_demag # Whether we should include the demag field
+        self._field_names: Optional[List[str]] = None
+        self.do_demag = do_demag # Whether we should include the demag field
         # List of all the materials used by the Simulation object
         self.materials: Optional[List[Any]] = None
 
@@ -65,6 +93,11 @@ class SimulationCore(ABC):
         self.known_quantities = known_quantities
         self.known_quantities_by_name = known_quantities_by_name
         self.known_field_quantities = known_field_quantities
+        # Fields defined once per material (signature contains '?').
+        self._per_material_fields: frozenset = frozenset(
+            q.name for q in self.known_quantities
+            if '?' in (q.signature or "")
+        )
 
         if name is None:
             self.name: str = features.get('etc', 'runid')
@@ -72,6 +105,13 @@ class SimulationCore(ABC):
             self.name: str = name
         log.info(f"Simulation(name={self.name}) object created")
 
+        # The output file names only depend on the name, so build them once.
+        self._savedir: Path = Path(features.get('etc', 'savedir'))
+        self._paths: Dict[str, Path] = {
+            ext: self._get_filename(ext)
+            for ext in ("_dat.ndt", "_dat.h5", "_tol.log", "_cvode.log")
+        }
+
         self._restarting: bool = False
         data_filenames: List[Path] = [
             self._ndtfilename(), self._h5filename(), self._tolfilename()
@@ -79,6 +119,8 @@ class SimulationCore(ABC):
         self._manage_output_files(data_filenames)
 
         self.clock: SimulationClock = SimulationClock()
+        # Step of the last call to save_data, see avoid_same_step.
+        self._last_saved_step: int = -1
 
         # The advance_time method does not allow to carry on the simulation
         # up to t = infinite. Sometimes we want to simulate for n steps,
@@ -95,65 +137,54 @@ class SimulationCore(ABC):
         # Example: hysteresis(..., save=[('averages', ...)])
         self.add_save_abbrev(
             'save_averages',
-            lambda sim: sim.save_data(avoid_same_step=True)
+            methodcaller('save_data', avoid_same_step=True)
         )
         self.add_save_abbrev(
             'save_fields',
-            lambda sim: sim.save_data(fields='all', avoid_same_step=True)
+            methodcaller('save_data', fields='all', avoid_same_step=True)
         )
         self.add_save_abbrev(
             'save_field_m',
-            lambda sim: sim.save_data(fields=['m'], avoid_same_step=True)
-        )
-        self.add_save_abbrev(
-            'save_restart',
-            lambda sim: sim.save_restart_file()
+            methodcaller('save_data', fields=['m'], avoid_same_step=True)
         )
+        self.add_save_abbrev('save_restart', _save_restart)
         self.add_do_abbrev('do_next_stage',
                            SimulationCore.hysteresis_next_stage)
         self.add_do_abbrev('do_exit', SimulationCore.hysteresis_exit)
 
-        self.writer = DataWriter(
+        # Rows of averages are written to disk by a background thread,
+        # so that saving does not hold up the time integration.
+        self.writer = AsyncDataWriter(DataWriter(
             ndt_filename=self._ndtfilename(),
             h5_filename=self._h5filename(),
-        )
-
-        # The following list contains a description of the physics components
-        # which are included in the physical model For example,
-        # ["exch", "demag"] indicates that exchange and demag are included.
-        # In this case, spin transfer torque is not. This information
-        # is used to understand which fields are relevant and which are not
-        # (so that we do not save empty fields). Following the previous
-        # example, dm_dcurrent, current_density won't be saved.
-        self._components: Optional[List[str]] = None
+        ))
+        self._save_data = self.writer.save
 
     def _manage_output_files(self, data_filenames: List[Path]):
         """
         Manages existing output files based on configuration (clean/restart).
         """
         if features.get('nmag', 'clean', raw=True):
-            for file_path in data_filenames:
-                if file_path.exists():
-                    new_path = file_path.parent / (file_path.name + ".old")
-                    log.info(f"Found old file {file_path}, renaming it to {new_path}")
-                    file_path.rename(new_path)
+            for file_path in _existing_files(data_filenames):
+                new_path = file_path.parent / (file_path.name + ".old")
+                log.info(f"Found old file {file_path}, renaming it to {new_path}")
+                os.replace(file_path, new_path)
                     
         elif features.get('nmag', 'restart', raw=True):
             log.info("Starting simulation in restart mode...")
             self._restarting = True
             
         else:
-            for filename in data_filenames:
-                if filename.exists():
-                    msg = (
-                        f"Error: Found old file {filename} -- cannot proceed. "
-                        "To start a simulation script with old data "
-                        "files present you either need to use '--clean' "
-                        "(and then the old files will be deleted), "
-                        "or use '--restart' in which case the run "
-                        "will be continued."
-                    )
-                    raise FileExistsError(msg)
+            for filename in _existing_files(data_filenames):
+                msg = (
+                    f"Error: Found old file {filename} -- cannot proceed. "
+                    "To start a simulation script with old data "
+                    "files present you either need to use '--clean' "
+                    "(and then the old files will be deleted), "
+                    "or use '--restart' in which case the run "
+                    "will be continued."
+                )
+                raise FileExistsError(msg)
 
     @property
     def id(self) -> int:
@@ -191,24 +222,50 @@ class SimulationCore(ABC):
         return self.clock.real_time
 
     @property
-    def components(self) -> List[str]:
-        """Get the physical components included in the model."""
-        if self._components is not None:
-            return self._components
+    def do_demag(self) -> bool:
+        """Whether the demag field is included in the model."""
+        return self._do_demag
+
+    @do_demag.setter
+    def do_demag(self, value: bool):
+        self._do_demag = value
+        # The list of components (and the fields they bring) depends on
+        # this flag.
+        components = ["exch"]
+        if value:
+            components.append("demag")
+        self._components: List[str] = components
+        self._field_names = None
 
-        else:
-            components = ["exch"]
-            if self.do_demag:
-                components.append("demag")
-            self._components = components
-            return components
+    @property
+    def components(self) -> List[str]:
+        """
+        Get the physical components included in the model.
+
+        This is a list describing the physics components which are included
+        in the physical model. For example, ["exch", "demag"] indicates that
+        exchange and demag are included. In this case, spin transfer torque
+        is not. This information is used to understand which fields are
+        relevant and which are not (so that we do not save empty fields).
+        Following the previous example, dm_dcurrent, current_density won't
+        be saved. The list is computed when the physics setup
+        (e.g. `do_demag`) is set.
+        """
+        return self._components
 
     def get_all_field_names(self) -> List[str]:
-        """Get all field names relevant to the enabled components."""
-        return [
-            q.name for q in self.known_field_quantities
-            if q.context is None or q.context in self.components
-        ]
+        """
+        Get all field names relevant to the enabled components.
+
+        The list is cached together with `components`.
+        """
+        if self._field_names is None:
+            components = frozenset(self.components)
+            self._field_names = [
+                q.name for q in self.known_field_quantities
+                if q.context is None or q.context in components
+            ]
+        return self._field_names
 
     @staticmethod
     def hysteresis_next_stage(sim: SimulationCore):
@@ -225,6 +282,7 @@ class SimulationCore(ABC):
         """
         sim.clock.exit_hysteresis = True
         sim.clock.stage_end = True
+        sim.writer.flush()
 
     simulation_relax = hysteresis_m.simulation_relax
     relax = simulation_relax
@@ -286,20 +344,19 @@ class SimulationCore(ABC):
 
     def _get_filename(self, ext: str) -> Path:
         """Get the full, absolute path for an output file."""
-        basename = self.name + ext
-        return Path(features.get('etc', 'savedir')) / basename
+        return self._savedir / (self.name + ext)
 
     def _ndtfilename(self) -> Path:
-        return self._get_filename("_dat.ndt")
+        return self._paths["_dat.ndt"]
 
     def _h5filename(self) -> Path:
-        return self._get_filename("_dat.h5")
+        return self._paths["_dat.h5"]
 
     def _statfilename(self) -> Path:
-        return self._get_filename("_cvode.log")
+        return self._paths["_cvode.log"]
 
     def _tolfilename(self) -> Path:
-        return self._get_filename("_tol.log")
+        return self._paths["_tol.log"]
 
     def get_restart_file_name(self) -> str:
         """Return the default name for the restart file."""
@@ -310,10 +367,11 @@ class SimulationCore(ABC):
         Returns all materials for a per-material field.
         Returns an empty list if the field is not per-material or 
         if materials have not been defined yet.
+        Raises KeyError if the field is not a known quantity.
         """
-        quantity = self.known_quantities_by_name[field_name]
-        
-        if '?' in (quantity.signature or ""):
+        if field_name not in self.known_quantities_by_name:
+            raise KeyError(field_name)
+        if field_name in self._per_material_fields:
             return self.materials if self.materials is not None else []
         
         return []
@@ -323,7 +381,36 @@ class SimulationCore(ABC):
     def save_spatial_fields(self,
                      filename: Optional[str] = None,
                      fieldnames: List[str] = []):
-        """Abstract method to save spatially-resolved fields."""
+        """
+        Abstract method to save spatially-resolved fields.
+
+        The data writer normally appends the fields to the *_dat.h5 file
+        itself, reading them with `get_subfield`. This method is only
+        called when `get_subfield` returns None or raises, and then has
+        to append the given fields to the file.
+
+        Field snapshots dominate the I/O cost of a simulation, so
+        implementations should lay the file out the way the writer does:
+
+        - Open the file once with ``libver='latest'``. When h5py is built
+          against parallel HDF5 and the simulation runs under MPI, open
+          it with ``driver='mpio'`` and the world communicator, and align
+          objects to the file system stripe size through the file access
+          property list (``set_alignment(1, stripe_size)``).
+        - Create one extendable dataset per subfield, chunked along the
+          mesh with ``chunks=(1, min(n, 1 << 16), ...)`` where ``n`` is
+          the number of mesh nodes, using ``compression='gzip'``,
+          ``compression_opts=1`` and ``shuffle=True``.
+        - Append new snapshots by resizing the datasets rather than
+          reopening the file for every save.
+
+        :Parameters:
+          `filename` : str
+            The file to save to. Defaults to the *_dat.h5 file.
+
+          `fieldnames` : list of str
+            The names of the fields to save.
+        """
         pass
 
 
@@ -346,7 +433,12 @@ class SimulationCore(ABC):
             If True, only save if clock.step has changed since last save.
             This prevents duplicate data points during hysteresis loops.
         """
-        self.writer.save(self, fields, avoid_same_step)
+        step = self.clock.step
+        if avoid_same_step and step == self._last_saved_step:
+            return
+
+        self._save_data(self, fields, avoid_same_step)
+        self._last_saved_step = step
 
     @abstractmethod
     def save_mesh(self, filename: str):
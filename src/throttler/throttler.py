@@ -11,14 +11,16 @@ class Throttler:
     Manages state to allow actions at most every N seconds per key.
 
     Attributes:
-        last_called (dict[Hashable, float]): A dictionary mapping
-            a unique key to the timestamp (from time.monotonic())
-            of its last allowed call.
+        last_called (dict[Hashable, int]): A dictionary mapping
+            a unique key to the timestamp in nanoseconds (from
+            time.monotonic_ns()) of its last allowed call.
     """
+    __slots__ = ('last_called',)
+
     def __init__(self):
         """Initializes the throttle state."""
         # Stores the time of the last successful call for each key
-        self.last_called: dict[Hashable, float] = {}
+        self.last_called: dict[Hashable, int] = {}
 
     def is_allowed(self, key: Hashable, report_delay: float) -> bool:
         """
@@ -37,15 +39,17 @@ class Throttler:
         Returns:
             True if the action is allowed, False otherwise.
         """
-        now = time.monotonic()
+        now = time.monotonic_ns()
+        last_called = self.last_called
 
         # Get the last time this key was allowed.
-        # Default to 0.0, ensuring the first call always passes
-        last_time = self.last_called.get(key, 0.0)
+        # None means never, and the first call always passes
+        last_time = last_called.get(key)
 
-        if now - last_time >= report_delay:
+        if (last_time is None
+                or now - last_time >= int(report_delay * 1_000_000_000)):
             # Time has elapsed. Allow the action and update the timestamp.
-            self.last_called[key] = now
+            last_called[key] = now
             return True
 
         # Not enough time has passed. Deny the action.
@@ -5,14 +5,53 @@ Time specification utilities for specifying when to do things
 
 import abc
 import math
-from typing import Any, Dict, Union, Optional
+import sys
+from fractions import Fraction
+from typing import Any, Dict, List, Union, Optional, Tuple
+
+import numpy as np
 
 TimeDict = Dict[str, Any]
 NextTime = Union[bool, int, float]
+_NUMERIC = (int, float)
+
+# Error messages of 'every', also checked by the tests.
+_NO_IDENTIFIER_MSG = (
+    "Bad usage of 'every': you must specify an identifier (string). "
+    "Example: every('step', 10)"
+)
+_LAST_NOT_AFTER_FIRST_MSG = (
+    "Bad usage of 'every': 'last' must be greater than 'first'."
+)
+_DELTA_NOT_POSITIVE_MSG = "Bad usage of 'every': delta must be positive."
 
 
 def _float_is_integer(f: float) -> bool:
-    return math.isclose(f, round(f))
+    # Positions that land exactly on a period are the common case, so try
+    # an exact compare before the tolerant one (e.g. 0.3 / 0.1 != 3).
+    r = round(f)
+    return f == r or math.isclose(f, r)
+
+
+def _encode_next_time(nt: NextTime) -> float:
+    # Encoding used by next_time_array: True (not constrained) is -inf,
+    # so it wins a minimum, False (never again) is +inf, so it loses it.
+    if nt is True:
+        return -math.inf
+    if nt is False:
+        return math.inf
+    return nt
+
+
+def _next_time_each(spec: "_WhenSpec", identifier: str, values: np.ndarray,
+                    this_time: TimeDict) -> np.ndarray:
+    """next_time_array computed value by value with spec.next_time."""
+    this_time = dict(this_time)
+    result = np.empty(values.shape)
+    for i, value in enumerate(values.tolist()):
+        this_time[identifier] = value
+        result[i] = _encode_next_time(spec.next_time(identifier, this_time))
+    return result
 
 
 # --- Abstract Base Class for Specification Logic ---
@@ -23,6 +62,7 @@ class _WhenSpec(abc.ABC):
     This is an internal implementation detail. The user interacts
     with the 'When' class, which wraps this.
     """
+    __slots__ = ()
 
     @abc.abstractmethod
     def __repr__(self) -> str:
@@ -34,19 +74,32 @@ class _WhenSpec(abc.ABC):
         """Check if the current time matches this specification."""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        """Check many values of one identifier at once (see When)."""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
         """Calculate the next matching time for the given identifier."""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        """next_time for many values of one identifier (see When)."""
+        raise NotImplementedError
+
 
 # --- Concrete Specification Implementations ---
 
 class _AtSpec(_WhenSpec):
     """Specification for a single point in time."""
+    __slots__ = ('identifier', 'value')
     
     def __init__(self, identifier: str, value: Any):
-        self.identifier = identifier
+        self.identifier = sys.intern(identifier)
         self.value = value
 
     def __repr__(self) -> str:
@@ -55,6 +108,12 @@ class _AtSpec(_WhenSpec):
     def match_time(self, this_time: TimeDict) -> bool:
         return this_time.get(self.identifier) == self.value
 
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        if self.identifier != identifier:
+            return np.full(values.shape, self.match_time(this_time))
+        return values == self.value
+
     def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
         if self.identifier != identifier:
             return True  # Irrelevant to this identifier, so don't block
@@ -71,13 +130,27 @@ class _AtSpec(_WhenSpec):
             else:
                 return False
 
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        if self.identifier != identifier:
+            return np.full(values.shape, -math.inf)
+        if values.dtype == bool:
+            return _next_time_each(self, identifier, values, this_time)
+        return np.where(values < self.value, self.value, math.inf)
+
 
 class _EverySpec(_WhenSpec):
     """Specification for a periodic event."""
+    __slots__ = ('identifier', 'delta', 'first', 'last')
 
     def __init__(self, identifier: str, delta: Optional[float], 
                  first: float, last: Optional[float]):
-        self.identifier = identifier
+        # Checked once here, so that match_time and next_time can divide
+        # by delta without guarding against it on every call.
+        if delta is not None and delta <= 0:
+            raise ValueError(f"{_DELTA_NOT_POSITIVE_MSG} Got delta={delta}")
+
+        self.identifier = sys.intern(identifier)
         self.delta = delta
         self.first = first
         self.last = last
@@ -96,22 +169,40 @@ class _EverySpec(_WhenSpec):
         t = this_time.get(self.identifier)
         if t is None:
             return False
-            
-        if self.first is not None and t < self.first:
+
+        first, last, delta = self.first, self.last, self.delta
+        if first is not None and t < first:
             return False
-        if self.last is not None and t > self.last:
+        if last is not None and t > last:
             return False
-        if self.delta is None:
+        if delta is None:
             return True
         
-        assert self.first is not None, "delta requires a 'first' value"
+        assert first is not None, "delta requires a 'first' value"
         
-        if self.delta <= 0:
-            return False
-            
-        pos = float((t - self.first) / self.delta)
+        pos = float((t - first) / delta)
         return _float_is_integer(pos)
 
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        if self.identifier != identifier:
+            return np.full(values.shape, self.match_time(this_time))
+
+        first, last, delta = self.first, self.last, self.delta
+        mask = np.ones(values.shape, dtype=bool)
+        if first is not None:
+            mask &= values >= first
+        if last is not None:
+            mask &= values <= last
+        if delta is None:
+            return mask
+
+        # Same test as _float_is_integer, i.e. math.isclose(pos, round(pos))
+        pos = (values - first) / delta
+        r = np.round(pos)
+        mask &= np.abs(pos - r) <= 1e-9 * np.maximum(np.abs(pos), np.abs(r))
+        return mask
+
     def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
         if self.identifier != identifier:
             return self.match_time(this_time)
@@ -120,125 +211,210 @@ class _EverySpec(_WhenSpec):
         if t is None:
             return False
 
-        if self.last is not None and t >= self.last:
+        first, last, delta = self.first, self.last, self.delta
+        if last is not None and t >= last:
             return False
             
-        if self.first is not None:
-            if t < self.first and self.delta is not None:
-                return self.first
+        if first is not None:
+            if t < first and delta is not None:
+                return first
                 
-        if self.delta is None:
+        if delta is None:
             return True
 
-        assert self.first is not None, "delta requires a 'first' value"
-        
-        if self.delta <= 0:
-            return False
+        assert first is not None, "delta requires a 'first' value"
 
-        pos = float((t - self.first) / self.delta)
+        pos = float((t - first) / delta)
         
         if _float_is_integer(pos):
             next_pos = int(round(pos)) + 1
         else:
             next_pos = int(pos) + 1
             
-        next_t = self.delta * next_pos + self.first
+        next_t = delta * next_pos + first
 
-        if self.last is not None and next_t > self.last:
+        if last is not None and next_t > last:
             return False
             
         return next_t
 
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        if self.identifier != identifier:
+            return np.full(values.shape,
+                           _encode_next_time(self.match_time(this_time)))
+
+        first, last, delta = self.first, self.last, self.delta
+        if delta is None:
+            result = np.full(values.shape, -math.inf)
+        else:
+            # Same steps as next_time, for all the values at once
+            pos = (values - first) / delta
+            r = np.round(pos)
+            on_period = np.abs(pos - r) <= 1e-9 * np.maximum(np.abs(pos),
+                                                              np.abs(r))
+            next_pos = np.where(on_period, r, np.floor(pos)) + 1
+            result = delta * next_pos + first
+            result[values < first] = first
+            if last is not None:
+                result[result > last] = math.inf
+        if last is not None:
+            result[values >= last] = math.inf
+        return result
+
 
 class _OrSpec(_WhenSpec):
-    """Specification for a logical OR of two specifications."""
+    """Specification for a logical OR of two or more specifications."""
+    __slots__ = ('specs',)
 
-    def __init__(self, spec1: _WhenSpec, spec2: _WhenSpec):
-        self.spec1 = spec1
-        self.spec2 = spec2
+    def __init__(self, *specs: _WhenSpec):
+        self.specs = specs
 
     def __repr__(self) -> str:
-        return f"({self.spec1!r} | {self.spec2!r})"
+        return "(" + " | ".join(repr(spec) for spec in self.specs) + ")"
 
     def match_time(self, this_time: TimeDict) -> bool:
-        return self.spec1.match_time(this_time) or \
-               self.spec2.match_time(this_time)
+        return any(spec.match_time(this_time) for spec in self.specs)
 
-    def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
-        nt1 = self.spec1.next_time(identifier, this_time)
-        nt2 = self.spec2.next_time(identifier, this_time)
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        mask = np.zeros(values.shape, dtype=bool)
+        for spec in self.specs:
+            mask |= spec.match_time_array(identifier, values, this_time)
+        return mask
 
-        nt1_is_bool = isinstance(nt1, bool)
-        nt2_is_bool = isinstance(nt2, bool)
-
-        if nt1_is_bool and nt2_is_bool:
-            return nt1 or nt2
-        
-        if nt1 is False:
-            return nt2
-        if nt2 is False:
-            return nt1
-
-        if nt1 is True:
-            return True
-        if nt2 is True:
-            return True
-            
-        return min(nt1, nt2)
+    def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
+        # True (never blocks) wins over any time, the earliest time wins
+        # over False (never happens again).
+        earliest: NextTime = False
+        for spec in self.specs:
+            nt = spec.next_time(identifier, this_time)
+            if nt is True:
+                return True
+            if nt is False:
+                continue
+            if earliest is False or nt < earliest:
+                earliest = nt
+        return earliest
+
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        # With the encoding of next_time_array the rules above are
+        # just the minimum.
+        result = np.full(values.shape, math.inf)
+        for spec in self.specs:
+            np.minimum(result,
+                       spec.next_time_array(identifier, values, this_time),
+                       out=result)
+        return result
 
 
 class _AndSpec(_WhenSpec):
-    """Specification for a logical AND of two specifications."""
+    """Specification for a logical AND of two or more specifications."""
+    __slots__ = ('specs',)
 
-    def __init__(self, spec1: _WhenSpec, spec2: _WhenSpec):
-        self.spec1 = spec1
-        self.spec2 = spec2
+    def __init__(self, *specs: _WhenSpec):
+        self.specs = specs
 
     def __repr__(self) -> str:
-        return f"({self.spec1!r} & {self.spec2!r})"
+        return "(" + " & ".join(repr(spec) for spec in self.specs) + ")"
 
     def match_time(self, this_time: TimeDict) -> bool:
-        return self.spec1.match_time(this_time) and \
-               self.spec2.match_time(this_time)
+        return all(spec.match_time(this_time) for spec in self.specs)
+
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        mask = np.ones(values.shape, dtype=bool)
+        for spec in self.specs:
+            mask &= spec.match_time_array(identifier, values, this_time)
+        return mask
 
     def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
-        # Use a copy to avoid side effects on the original time dict
-        temp_time = this_time.copy()
-        save_t = temp_time.get(identifier)
+        save_t = this_time.get(identifier)
         if save_t is None:
             return False # Can't calculate if identifier is missing
 
-        ntmax: Optional[Union[int, float]] = None
-        
-        both_match = False
-        while not both_match:
-            nt1 = self.spec1.next_time(identifier, temp_time)
-            nt2 = self.spec2.next_time(identifier, temp_time)
+        # The candidate times are tried by writing them into this_time,
+        # which is restored before returning. The operands only read it.
+        try:
+            return self._next_time(identifier, this_time, len(self.specs))
+        finally:
+            this_time[identifier] = save_t
+
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        # The search for a common time is iterative, so go value by value.
+        return _next_time_each(self, identifier, values, this_time)
+
+    def _next_time(self, identifier: str, this_time: TimeDict,
+                   n: int) -> NextTime:
+        """
+        next_time of the first n operands, combined pairwise from the
+        left as in the chain of binary 'and's ((a & b) & c) & ...
+        """
+        spec = self.specs[n - 1]
+        if n == 1:
+            return spec.next_time(identifier, this_time)
+
+        t = this_time[identifier]
+        # Candidates already tried, as positions within the period of the
+        # operands (see _periodicity), to detect a search going in circles.
+        periodicity: Optional[Tuple[Optional[Fraction], float, bool]] = None
+        seen = None
+        while True:
+            nt1 = self._next_time(identifier, this_time, n - 1)
+            this_time[identifier] = t
+            nt2 = spec.next_time(identifier, this_time)
 
             if nt1 is False or nt2 is False:
                 return False
-
+            # An operand returning True does not constrain the identifier,
+            # so the other one decides.
             if nt1 is True:
                 return nt2
             if nt2 is True:
                 return nt1
 
+            # The operands proposing the later time are taken to match
+            # there, the others are checked. If they don't match, we try
+            # again from there.
+            t = this_time[identifier] = max(nt1, nt2)
             if nt1 > nt2:
-                ntmax, argmin = nt1, self.spec2
-            else:
-                ntmax, argmin = nt2, self.spec1
-
-            temp_time[identifier] = ntmax
-            both_match = argmin.match_time(temp_time)
-
-
-        assert ntmax is not None, "Logic error: 'and' loop exited without setting ntmax"
-
-        return ntmax
+                if spec.match_time(this_time):
+                    return t
+            elif all(s.match_time(this_time) for s in self.specs[:n - 1]):
+                return t
+
+            # Past the offset the operands repeat with the period, so
+            # coming back to a position already tried means no candidate
+            # will ever match. Only worked out once a first candidate fails.
+            if seen is None:
+                periodicity = _combined_periodicity(self.specs[:n],
+                                                    identifier)
+                seen = set()
+            if periodicity is None or periodicity[0] is None:
+                continue
+            period, offset, ends = periodicity
+            if t < offset:
+                continue
+            pos = (t - offset) / float(period)
+            pos = round(pos - math.floor(pos), 9) % 1.0
+            if pos in seen:
+                if ends:
+                    # No candidate will match, but with a 'last' that is
+                    # not down to contradicting conditions.
+                    return False
+                raise RuntimeError(
+                    f"Could not find the next time for {identifier!r} "
+                    f"matching {self!r}: the conditions are mutually "
+                    "exclusive."
+                )
+            seen.add(pos)
 
 
 class _NeverSpec(_WhenSpec):
     """Specification that never matches."""
+    __slots__ = ()
     
     def __repr__(self) -> str:
         return "never"
@@ -246,9 +422,85 @@ class _NeverSpec(_WhenSpec):
     def match_time(self, this_time: TimeDict) -> bool:
         return False
 
+    def match_time_array(self, identifier: str, values: np.ndarray,
+                         this_time: TimeDict) -> np.ndarray:
+        return np.zeros(values.shape, dtype=bool)
+
     def next_time(self, identifier: str, this_time: TimeDict) -> NextTime:
         return False
 
+    def next_time_array(self, identifier: str, values: np.ndarray,
+                        this_time: TimeDict) -> np.ndarray:
+        return np.full(values.shape, math.inf)
+
+
+def _flatten(cls: type, *specs: _WhenSpec) -> List[_WhenSpec]:
+    """
+    Lists the operands of a chain such as a | b | c, so that it becomes a
+    single n-ary node rather than a nested tree of binary ones.
+    """
+    flat: List[_WhenSpec] = []
+    for spec in specs:
+        if isinstance(spec, cls):
+            flat.extend(spec.specs)
+        else:
+            flat.append(spec)
+    return flat
+
+
+def _lcm(a: Fraction, b: Fraction) -> Fraction:
+    """Least common multiple of two positive fractions."""
+    den = math.lcm(a.denominator, b.denominator)
+    return Fraction(math.lcm(int(a * den), int(b * den)), den)
+
+
+def _periodicity(spec: _WhenSpec, identifier: str
+                 ) -> Optional[Tuple[Optional[Fraction], float, bool]]:
+    """
+    Returns (period, offset, ends) such that, for values of `identifier`
+    from offset onwards, `spec` behaves the same at t and t + period,
+    apart from a 'last' ending it; ends tells whether there is one.
+    period is None when any period will do, e.g. for a spec not
+    depending on the identifier. Returns None when this cannot be
+    worked out (e.g. non-numeric values).
+    """
+    if isinstance(spec, _NeverSpec):
+        return None, -math.inf, False
+    if isinstance(spec, (_AtSpec, _EverySpec)) \
+            and spec.identifier != identifier:
+        return None, -math.inf, False
+    try:
+        if isinstance(spec, _AtSpec):
+            return None, float(spec.value), False
+        if isinstance(spec, _EverySpec):
+            ends = spec.last is not None
+            if spec.delta is None:
+                return None, float(spec.first), ends
+            return Fraction(str(spec.delta)), float(spec.first), ends
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(spec, (_OrSpec, _AndSpec)):
+        return None
+    return _combined_periodicity(spec.specs, identifier)
+
+
+def _combined_periodicity(specs: Tuple[_WhenSpec, ...], identifier: str
+                          ) -> Optional[Tuple[Optional[Fraction], float, bool]]:
+    """_periodicity of an 'and' or 'or' of the given specifications."""
+    period: Optional[Fraction] = None
+    offset = -math.inf
+    ends = False
+    for sub in specs:
+        sub_periodicity = _periodicity(sub, identifier)
+        if sub_periodicity is None:
+            return None
+        sub_period, sub_offset, sub_ends = sub_periodicity
+        if sub_period is not None:
+            period = sub_period if period is None else _lcm(period, sub_period)
+        offset = max(offset, sub_offset)
+        ends = ends or sub_ends
+    return period, offset, ends
+
 
 # --- Public-Facing 'When' Class ---
 
@@ -259,6 +511,8 @@ class When:
     This class is a wrapper around a 'spec' object that implements
     the actual logic.
     """
+    __slots__ = ('spec',)
+
     def __init__(self, spec: _WhenSpec):
         self.spec = spec
 
@@ -272,6 +526,21 @@ class When:
         """Checks if the specification matches the given time."""
         return self.spec.match_time(this_time)
 
+    def match_time_array(self, identifier: str, values: Any,
+                         this_time: Optional[TimeDict] = None) -> np.ndarray:
+        """
+        Checks many values of the given identifier at once.
+
+        Returns a boolean array which is True where setting `identifier`
+        to the corresponding entry of `values` would make `match_time`
+        return True. The other identifiers are taken from `this_time`.
+        Useful when post-processing, e.g. to select the saved steps.
+        Values must be plain numbers (not SI quantities).
+        """
+        values = np.asarray(values)
+        return self.spec.match_time_array(identifier, values,
+                                          this_time or {})
+
     def next_time(self, identifier: str, this_time: TimeDict, 
                   tols: Optional[Dict[str, float]] = None) -> NextTime:
         """
@@ -282,41 +551,99 @@ class When:
         inaccuracies.
         """
         nt = self.spec.next_time(identifier, this_time)
+        if tols is None:
+            return nt
 
         # Apply tolerance logic from the original class
-        if (tols is not None 
-                and identifier in tols 
-                and isinstance(nt, (int, float))):
-            
-            tol = tols[identifier]
-            tt = this_time[identifier]
-            
-            if tol > 0.0 and abs(nt - tt) < tol:
-                # We are too close to the current time.
-                # Advance time slightly and recalculate.
-                temp_time = this_time.copy()
-                temp_time[identifier] = nt + tol
-                nt = self.spec.next_time(identifier, temp_time)
+        # True/False are not times, so no tolerance applies to them. The
+        # type is checked first, so that the tolerance (an SI value in
+        # hysteresis) is only compared with 0.0 when it may be used.
+        if isinstance(nt, bool) or not isinstance(nt, _NUMERIC):
+            return nt
+        tol = tols.get(identifier)
+        if tol is None or tol <= 0.0:
+            return nt
+
+        if abs(nt - this_time[identifier]) < tol:
+            # We are too close to the current time.
+            # Advance time slightly and recalculate.
+            temp_time = this_time.copy()
+            temp_time[identifier] = nt + tol
+            nt = self.spec.next_time(identifier, temp_time)
 
         return nt
 
+    def next_time_array(self, identifier: str, values: Any,
+                        this_time: Optional[TimeDict] = None,
+                        tols: Optional[Dict[str, float]] = None
+                        ) -> np.ndarray:
+        """
+        Calculates next_time for many values of the given identifier.
+
+        Returns a float array with, for each entry of `values`, what
+        `next_time` returns when `identifier` is set to it: +inf where
+        that is False (no further match) and -inf where it is True (the
+        identifier is not constrained). The other identifiers are taken
+        from `this_time`, and 'tols' works as in `next_time`.
+        Values must be plain numbers (not SI quantities).
+        """
+        values = np.asarray(values)
+        if values.dtype != bool:
+            values = values.astype(float)
+        this_time = this_time or {}
+        nt = self.spec.next_time_array(identifier, values, this_time)
+        if tols is None:
+            return nt
+
+        tol = tols.get(identifier)
+        if tol is None or tol <= 0.0:
+            return nt
+
+        close = np.isfinite(nt) & (np.abs(nt - values) < tol)
+        if close.any():
+            nt[close] = self.spec.next_time_array(
+                identifier, nt[close] + tol, this_time
+            )
+        return nt
+
     def __or__(self, other: "When") -> "When":
         """Combines two 'When' objects with a logical OR."""
         if not isinstance(other, When):
             return NotImplemented
-        return When(_OrSpec(self.spec, other.spec))
+        # never | x and x | x are just x.
+        if isinstance(self.spec, _NeverSpec) or self.spec is other.spec:
+            return other
+        if isinstance(other.spec, _NeverSpec):
+            return self
+        return When(_OrSpec(*_flatten(_OrSpec, self.spec, other.spec)))
 
     def __and__(self, other: "When") -> "When":
         """
         Combines two 'When' objects with a logical AND.
         
-        WARNING: As in the original, this can lead to infinite loops
-        if the two conditions are mutually exclusive (e.g.,
-        every('step', 2) & every('step', 2, first=1)).
-        Use with care.
+        WARNING: If the two conditions are mutually exclusive (e.g.,
+        every('step', 2) & every('step', 2, first=1)), next_time raises
+        a RuntimeError once the candidate times repeat modulo the
+        combined period of the operands (the lcm of their deltas), or
+        returns False if one of them has a 'last'. Finding that out, or
+        a distant common time such as the 4002000 of
+        every('step', 2000) & every('step', 2001), can take many
+        candidates. If the deltas are not plain numbers the search
+        cannot tell, and may go on forever. Use with care.
         """
         if not isinstance(other, When):
             return NotImplemented
+        # never & x is never.
+        if isinstance(self.spec, _NeverSpec):
+            return self
+        if isinstance(other.spec, _NeverSpec):
+            return other
+        # 'and' is evaluated pairwise from the left (see _AndSpec), which
+        # is not associative: (a & b) & c may give a different next time
+        # than a & (b & c). So only a left operand is flattened, which
+        # keeps a chain a & b & c the same as ((a & b) & c).
+        if isinstance(self.spec, _AndSpec):
+            return When(_AndSpec(*self.spec.specs, other.spec))
         return When(_AndSpec(self.spec, other.spec))
 
 
@@ -364,25 +691,18 @@ def every(arg1: Union[str, float, int],
 
     # 1. Check if identifier was found and is a string
     if not isinstance(identifier, str):
-        raise ValueError(
-            "Bad usage of 'every': you must specify an identifier (string). "
-            "Example: every('step', 10)"
-        )
+        raise ValueError(_NO_IDENTIFIER_MSG)
 
     # 2. Check 'last' vs 'first'
     if last is not None and last <= first:
         raise ValueError(
-            "Bad usage of 'every': 'last' must be greater than 'first'. "
-            f"Got first={first}, last={last}"
+            f"{_LAST_NOT_AFTER_FIRST_MSG} Got first={first}, last={last}"
         )
 
     # 3. Check delta
     if delta is not None:
         if delta <= 0:
-            raise ValueError(
-                "Bad usage of 'every': delta must be positive. "
-                f"Got delta={delta}"
-            )
+            raise ValueError(f"{_DELTA_NOT_POSITIVE_MSG} Got delta={delta}")
 
     return When(_EverySpec(identifier, delta, first, last))
 
@@ -89,6 +89,8 @@ class TestClassFunctionality(unittest.TestCase):
     s1 = SI(10, "m/s")
     self.assertEqual(s1.magnitude, 10)
     self.assertEqual(str(s1._quantity.units), "meter / second")
+    self.assertEqual(str(s1.units), "meter / second")
+    self.assertEqual(hash(s1.units), hash(SI(2, "m/s").units))
 
     # Legacy list-based initialization
     s2 = SI(10, ['m', 1, 's', -1])
@@ -157,6 +157,17 @@ class TestSimulationClock(unittest.TestCase):
         # Check for the formatted nanosecond string
         self.assertIn("0.12 ns", s)
         self.assertIn("Time=0.12 ns", s)
+
+    def test_str_follows_changes(self):
+        """Test that the cached __str__ is refreshed when the clock changes."""
+        s = str(self.clock)
+        self.assertEqual(str(self.clock), s)
+
+        self.clock.step = 7
+        self.clock.time += SI(3e-12, "s")
+        s = str(self.clock)
+        self.assertIn("Step=7", s)
+        self.assertIn("Time=3.00 ps", s)
 
 
 if __name__ == '__main__':
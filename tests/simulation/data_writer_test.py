@@ -0,0 +1,464 @@
+import unittest
+import csv
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+from typing import Dict, List, Any, Optional
+
+import h5py
+import numpy as np
+import pytest
+
+from si.physical import SI
+from simulation.quantity import known_quantities
+from simulation.data_writer import AsyncDataWriter, DataWriter
+
+class MockMaterial:
+    def __init__(self, name: str):
+        self.name = name
+
+class MockSimulation:
+    """
+    A mock implementation of the SimulationSource protocol.
+    """
+    def __init__(self, provides_arrays: bool = True):
+        self.name = "Test_Sim"
+        self.id = 1
+        self.step = 0
+        self.stage = 1
+        self.stage_step = 0
+        self.time = 0.0
+        self.stage_time = 0.0
+        self.real_time = 123.45
+        
+        # Track calls to save_spatial_fields for assertion
+        self.save_spatial_calls: List[tuple] = []
+        self.subfield_calls: List[str] = []
+        # Whether get_subfield returns the arrays (otherwise the writer
+        # falls back to save_spatial_fields)
+        self.provides_arrays = provides_arrays
+        # Node values of the fields, which the averages are computed from
+        self.field_values: Dict[str, np.ndarray] = {
+            'm': np.tile([1.0, 0.0, 0.0], (4, 1)),
+            'H_ext': np.full(4, 500.0),
+            'E_total': np.full(4, 1.5e-21),
+        }
+
+    def get_subfield_average(self, subfieldname: str, mat_name: Optional[str] = None) -> Any:
+        values = self.field_values.get(subfieldname)
+        if values is None:
+            return 0.0
+        average = values.mean(axis=0)
+        if subfieldname == 'H_ext':
+            # Test returning an SI object
+            return SI(float(average), 'A/m')
+        # A list for vector fields ('m'), a float for scalar ones
+        return average.tolist()
+
+    def get_subfield(self, subfieldname: str) -> Any:
+        self.subfield_calls.append(subfieldname)
+        if not self.provides_arrays:
+            return None
+        if subfieldname == 'm_Permalloy':
+            return self.field_values['m']
+        return np.full(4, self.step, dtype=float)
+
+    def get_materials_of_field(self, field_name: str) -> List[Any]:
+        # Like SimulationCore, only known quantities are fields
+        if field_name not in {q.name for q in known_quantities}:
+            raise KeyError(field_name)
+        # Return a list of mock objects with a .name attribute
+        if field_name == 'm':
+            return [MockMaterial("Permalloy")]
+        return []
+
+    def get_all_field_names(self) -> List[str]:
+        return ['m', 'H_ext', 'E_total']
+
+    def save_spatial_fields(self, filename: str, fieldnames: List[str]) -> None:
+        self.save_spatial_calls.append((filename, fieldnames))
+
+
+class TestDataWriter(unittest.TestCase):
+
+    @pytest.fixture(autouse=True)
+    def setup_writer(self, tmp_path):
+        # Output files go to pytest's temporary directory for the test
+        self.tmp_path = tmp_path
+        self.ndt_path = tmp_path / "output.ndt"
+        self.h5_path = tmp_path / "output.h5"
+
+        self.writer = DataWriter(self.ndt_path, self.h5_path)
+        self.source = MockSimulation()
+        yield
+        self.writer.close()
+
+    def test_file_creation_and_header(self):
+        """Test that the .ndt file is created and the header is written correctly."""
+        self.writer.save(self.source)
+
+        self.assertTrue(self.ndt_path.exists(), "NDT file was not created")
+
+        with open(self.ndt_path, 'r', newline='') as f:
+            lines = f.readlines()
+            
+        # Check metadata comment
+        self.assertTrue(lines[0].startswith("# Simulation: Test_Sim"))
+        
+        # Check header columns (tab-separated)
+        header = lines[1].strip().split('\t')
+        self.assertIn('step', header)
+        self.assertIn('time', header)
+        self.assertIn('m_Permalloy_0', header)
+        self.assertIn('H_ext', header)
+
+    def test_si_unit_extraction_fix(self):
+        """
+        Ensure SI objects are converted to floats.
+        """
+        # The mock returns SI(500.0, 'A/m') for 'H_ext'
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        with open(self.ndt_path, 'r', newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+            pass
+        
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.strip() for l in f.readlines() if not l.startswith("#")]
+        
+        header = lines[0].split('\t')
+        data = lines[1].split('\t')
+        
+        # Find index of H_ext
+        h_ext_idx = header.index('H_ext')
+        h_ext_val = data[h_ext_idx]
+        
+        self.assertEqual(float(h_ext_val), 500.0)
+
+    def test_values_are_written_exactly(self):
+        """Test that floats read back unchanged and ints are not truncated."""
+        self.source.time = 0.1 + 0.2
+        self.source.stage_time = 1.0 / 3.0
+        self.source.stage = 2.5
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.rstrip('\n') for l in f if not l.startswith('#')]
+        row = dict(zip(lines[0].split('\t'), lines[1].split('\t')))
+
+        self.assertEqual(float(row['time']), 0.1 + 0.2)
+        self.assertEqual(float(row['stage_time']), 1.0 / 3.0)
+        self.assertEqual(row['stage'], '2.5')
+        self.assertEqual(row['step'], '0')
+
+    def test_none_values_are_left_empty(self):
+        """Test that None values give empty cells instead of failing."""
+        self.writer.save(self.source)
+
+        self.source.step = 1
+        self.source.real_time = None
+        average = self.source.get_subfield_average
+        self.source.get_subfield_average = lambda name, mat_name=None: (
+            [1.0, None, 0.0] if name == 'm' else average(name, mat_name)
+        )
+        self.writer.save(self.source)
+
+        self.source.step = 2
+        self.source.real_time = 1.0
+        self.source.get_subfield_average = average
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.rstrip('\n') for l in f if not l.startswith('#')]
+        header = lines[0].split('\t')
+        rows = [dict(zip(header, line.split('\t'))) for line in lines[1:]]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]['step'], '1')
+        self.assertEqual(rows[1]['real_time'], '')
+        self.assertEqual(rows[1]['m_Permalloy_1'], '')
+        self.assertEqual(float(rows[1]['m_Permalloy_0']), 1.0)
+        self.assertEqual(float(rows[2]['real_time']), 1.0)
+
+    def test_avoid_same_step(self):
+        """Test that data is not written if the step hasn't changed and the flag is set."""
+        self.source.step = 10
+        self.writer.save(self.source) # First save
+        
+        self.writer.save(self.source, avoid_same_step=True)
+        self.writer.flush()
+        
+        with open(self.ndt_path, 'r') as f:
+            lines = f.readlines()
+            self.assertEqual(len(lines), 3)
+
+    def test_missing_column_is_left_empty(self):
+        """Test that a column which disappears after the header is written empty."""
+        self.writer.save(self.source)
+
+        self.source.get_subfield_average = lambda name, mat_name=None: (
+            None if name == 'H_ext' else 0.0
+        )
+        self.source.step = 1
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.rstrip('\n') for l in f.readlines() if not l.startswith("#")]
+
+        header = lines[0].split('\t')
+        h_ext_idx = header.index('H_ext')
+        self.assertEqual(float(lines[1].split('\t')[h_ext_idx]), 500.0)
+        self.assertEqual(lines[2].split('\t')[h_ext_idx], '')
+
+    def test_rows_are_buffered_until_flush(self):
+        """Test that rows reach the file on flush() and on close()."""
+        def count_rows():
+            with open(self.ndt_path, 'r') as f:
+                return len(f.readlines()) - 2
+
+        self.writer.save(self.source)
+        self.assertEqual(count_rows(), 0)
+
+        self.writer.flush()
+        self.assertEqual(count_rows(), 1)
+
+        self.source.step = 1
+        self.writer.save(self.source)
+        self.writer.close()
+        self.assertEqual(count_rows(), 2)
+
+        # Saving after close() reopens the file and appends.
+        self.source.step = 2
+        self.writer.save(self.source)
+        self.writer.close()
+        self.assertEqual(count_rows(), 3)
+
+    def test_unbuffered_rows(self):
+        """Test that a buffer size of 0 writes every row straight away."""
+        writer = DataWriter(self.ndt_path, self.h5_path, buffer_size=0)
+        writer.save(self.source)
+        self.source.step = 1
+        writer.save(self.source)
+
+        with open(self.ndt_path, 'r') as f:
+            self.assertEqual(len(f.readlines()), 4)
+        writer.close()
+
+    @patch('time.monotonic_ns')
+    def test_rows_are_flushed_after_interval(self, mock_monotonic):
+        """Test that buffered rows are written out once the interval passed."""
+        def count_rows():
+            with open(self.ndt_path, 'r') as f:
+                return len(f.readlines()) - 2
+
+        mock_monotonic.return_value = 1000 * 10**9
+        self.writer.save(self.source)
+        self.source.step = 1
+        self.writer.save(self.source)
+        self.assertEqual(count_rows(), 0)
+
+        mock_monotonic.return_value = 1002500 * 10**6
+        self.source.step = 2
+        self.writer.save(self.source)
+        self.assertEqual(count_rows(), 3)
+
+    def test_only_rank_zero_writes_ndt(self):
+        """Test that non-zero ranks skip the .ndt file but still save fields."""
+        writer = DataWriter(self.ndt_path, self.h5_path, rank=1)
+        writer.save(self.source, fields=['m'])
+
+        self.assertFalse(self.ndt_path.exists())
+        self.assertFalse(self.h5_path.exists())
+        self.assertEqual(self.source.subfield_calls, ['m_Permalloy'])
+
+    @patch('time.time')
+    def test_localtime_column(self, mock_time):
+        """Test that the localtime column follows the wall clock."""
+        mock_time.return_value = 1000.25
+        self.writer.save(self.source)
+        mock_time.return_value = 1000.75
+        self.writer.save(self.source)
+        mock_time.return_value = 1001.5
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.rstrip('\n') for l in f.readlines() if not l.startswith("#")]
+
+        idx = lines[0].split('\t').index('localtime')
+        expected = [
+            time.strftime("%Y/%m/%d-%H:%M:%S", time.localtime(t))
+            for t in (1000, 1000, 1001)
+        ]
+        self.assertEqual([l.split('\t')[idx] for l in lines[1:]], expected)
+
+    def test_spatial_save(self):
+        """Test that fields are appended to the .h5 file, one row per save."""
+        self.writer.save(self.source, fields=['m', 'H_ext'])
+        self.source.step = 3
+        self.source.time = 1e-12
+        self.writer.save(self.source, fields=['H_ext'])
+        self.writer.close()
+
+        self.assertEqual(self.source.save_spatial_calls, [])
+        with h5py.File(self.h5_path, 'r') as f:
+            self.assertEqual(sorted(f['fields']), ['H_ext', 'm_Permalloy'])
+            m = f['fields/m_Permalloy']
+            self.assertEqual(m['data'].shape, (1, 4, 3))
+            self.assertEqual(m['data'][0, 0].tolist(), [1.0, 0.0, 0.0])
+            h = f['fields/H_ext']
+            self.assertEqual(h['data'][:, 0].tolist(), [0.0, 3.0])
+            self.assertEqual(h['step'][:].tolist(), [0, 3])
+            self.assertEqual(h['time'][:].tolist(), [0.0, 1e-12])
+
+    def test_spatial_save_all(self):
+        """Test the 'all' keyword for fields."""
+        self.writer.save(self.source, fields='all')
+        
+        # Mock returns ['m', 'H_ext', 'E_total'] for get_all_field_names
+        self.assertEqual(self.source.subfield_calls,
+                         ['m_Permalloy', 'H_ext', 'E_total'])
+
+    def test_spatial_save_subfield_name(self):
+        """Test that a subfield name is saved as it is."""
+        self.writer.save(self.source, fields=['m_Permalloy'])
+
+        self.assertEqual(self.source.subfield_calls, ['m_Permalloy'])
+        self.assertEqual(self.source.save_spatial_calls, [])
+        with h5py.File(self.h5_path, 'r') as f:
+            self.assertEqual(list(f['fields']), ['m_Permalloy'])
+
+        source = MockSimulation(provides_arrays=False)
+        self.writer.save(source, fields=['m_Permalloy'])
+        self.assertEqual(source.save_spatial_calls,
+                         [(str(self.h5_path), ['m_Permalloy'])])
+
+    def test_spatial_save_fallback(self):
+        """Test that the source saves the fields if it has no arrays to give."""
+        source = MockSimulation(provides_arrays=False)
+        self.writer.save(source, fields=['m', 'H_ext'])
+        
+        self.assertEqual(len(source.save_spatial_calls), 1)
+        filename, fields = source.save_spatial_calls[0]
+        
+        self.assertEqual(filename, str(self.h5_path))
+        self.assertEqual(fields, ['m', 'H_ext'])
+        self.assertFalse(self.h5_path.exists())
+
+    def test_spatial_save_fallback_on_error(self):
+        """Test that the source saves the fields if reading one fails."""
+        def broken_subfield(subfieldname):
+            raise RuntimeError("no such subfield")
+        self.source.get_subfield = broken_subfield
+        self.writer.save(self.source, fields=['m'])
+
+        self.assertEqual(self.source.save_spatial_calls,
+                         [(str(self.h5_path), ['m'])])
+        self.assertFalse(self.h5_path.exists())
+
+class TestAsyncDataWriter(unittest.TestCase):
+
+    @pytest.fixture(autouse=True)
+    def setup_writer(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.ndt_path = tmp_path / "output.ndt"
+        self.h5_path = tmp_path / "output.h5"
+
+        self.writer = AsyncDataWriter(DataWriter(self.ndt_path, self.h5_path))
+        self.source = MockSimulation()
+        yield
+        self.writer.close()
+
+    def read_steps(self):
+        with open(self.ndt_path, 'r') as f:
+            lines = [l.rstrip('\n') for l in f.readlines() if not l.startswith("#")]
+        idx = lines[0].split('\t').index('step')
+        return [int(l.split('\t')[idx]) for l in lines[1:]]
+
+    def test_rows_are_written_in_order(self):
+        """Test that queued rows reach the file, in order, after flush()."""
+        for step in range(5):
+            self.source.step = step
+            self.writer.save(self.source)
+        self.writer.save(self.source, avoid_same_step=True)
+        self.writer.flush()
+
+        self.assertEqual(self.read_steps(), [0, 1, 2, 3, 4])
+
+    def test_rows_after_a_none_value(self):
+        """Test that a None value does not stop the worker writing rows."""
+        self.source.real_time = None
+        self.writer.save(self.source)
+        self.source.real_time = 1.0
+        self.source.step = 1
+        self.writer.save(self.source)
+        self.writer.flush()
+
+        self.assertEqual(self.read_steps(), [0, 1])
+
+    def test_row_is_a_snapshot(self):
+        """Test that a row holds the values at the time save() was called."""
+        self.source.step = 7
+        self.writer.save(self.source)
+        self.source.step = 8
+        self.writer.close()
+
+        self.assertEqual(self.read_steps(), [7])
+
+    def test_fields_are_saved_synchronously(self):
+        """Test that fields are read from the source before save() returns."""
+        self.writer.save(self.source, fields=['m'])
+
+        self.assertEqual(self.source.subfield_calls, ['m_Permalloy'])
+
+    def test_worker_error_is_raised(self):
+        """Test that a failure in the worker thread surfaces in flush()."""
+        def fail(*args):
+            raise OSError("disk full")
+        self.writer.writer._write_ndt_row = fail
+
+        self.writer.save(self.source)
+        with self.assertRaises(RuntimeError) as cm:
+            self.writer.flush()
+        self.assertIsInstance(cm.exception.__cause__, OSError)
+
+        with self.assertRaises(RuntimeError):
+            self.writer.save(self.source)
+
+        self.writer._errors.clear()
+
+    def test_rows_are_written_at_exit(self):
+        """Test that queued rows reach the file if close() is never called."""
+        script = (
+            "import sys\n"
+            "from pathlib import Path\n"
+            "from data_writer_test import MockSimulation\n"
+            "from simulation.data_writer import AsyncDataWriter, DataWriter\n"
+            "writer = AsyncDataWriter(DataWriter(Path(sys.argv[1]),\n"
+            "                                    Path(sys.argv[2])))\n"
+            "source = MockSimulation()\n"
+            "for step in range(20000):\n"
+            "    source.step = step\n"
+            "    writer.save(source)\n"
+        )
+        ndt_path = self.tmp_path / "exit.ndt"
+        h5_path = self.tmp_path / "exit.h5"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run(
+            [sys.executable, "-c", script, str(ndt_path), str(h5_path)],
+            cwd=Path(__file__).parent, env=env,
+            capture_output=True, text=True
+        )
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stderr, "")
+        with open(ndt_path, 'r') as f:
+            rows = [l for l in f.readlines() if not l.startswith("#")]
+        self.assertEqual(len(rows), 1 + 20000)
@@ -1,143 +1,264 @@
-import unittest
-from unittest.mock import MagicMock, patch, mock_open
+"""
+Tests the helper functions within the hysteresis.py file
+that do not depend on a live Simulation object, and the way
+simulation_hysteresis leaves the data writer (using a stub simulation).
 
+Tests for sim-dependent functions (like _update_progress_file)
+and full integration tests (for simulation_hysteresis) will be
+added after the Simulation class is defined.
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from si.physical import SI
+from simulation.data_writer import AsyncDataWriter, DataWriter
 from simulation.hysteresis import (
     _string_normalise,
     _append_x_list,
-    _join_save_and_do_lists
+    _split_predefined,
+    _join_save_and_do_lists,
+    simulation_hysteresis
     # _update_progress_file will be tested later with the sim object
     # _next_deltas and _next_time will be tested later with the sim object
-    # simulation_relax and simulation_hysteresis will be tested later
+    # simulation_relax will be tested later
 )
 from when import at, every, When
 
-class TestHysteresisHelpers(unittest.TestCase):
+class ClockDict(dict):
+    """A clock the time specifications can read as a dict."""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+class StubSimulation:
     """
-    Tests the helper functions within the hysteresis.py file
-    that do not depend on a live Simulation object.
-    
-    Tests for sim-dependent functions (like _update_progress_file)
-    and integration tests (for simulation_hysteresis) will be
-    added after the Simulation class is defined.
+    Just enough of a Simulation for simulation_hysteresis: it converges
+    after 10 steps and saves averages through a real (async) writer.
     """
-
-    def test_string_normalise(self):
-        """Tests the string normalization function."""
-        self.assertEqual(
-            _string_normalise("save  fields"), "save_fields"
-        )
-        self.assertEqual(
-            _string_normalise("Save_Fields"), "save_fields"
+    def __init__(self, path):
+        self.name = str(path / "stub")
+        self._restarting = False
+        self.max_time_reached = 1.0
+        self.convergence = MagicMock()
+        self.clock = ClockDict(
+            id=0, stage=1, step=0, stage_step=0, zero_stage_step=0,
+            time=0.0, stage_time=0.0, zero_stage_time=0.0, real_time=0.0,
+            stage_end=False, exit_hysteresis=False, convergence=False,
+            time_reached_si=SI(0.0, "s")
         )
-        self.assertEqual(
-            _string_normalise("Save_Fields", lower=False), "Save_Fields"
-        )
-        self.assertEqual(
-            _string_normalise("save fields", spaces=None), "save fields"
-        )
-        self.assertEqual(
-            _string_normalise(" save__fields ", spaces='-'), "-save-fields-"
-        )
-
-    def test_append_x_list(self):
-        """Tests the logic for parsing 'save' and 'do' lists."""
-        
-        # Create mock action functions
-        mock_action_avg = MagicMock(name="averages_func")
-        mock_action_fld = MagicMock(name="fields_func")
-        
-        predefined = {
-            "save_averages": mock_action_avg,
-            "do_fields": mock_action_fld
+        self.writer = AsyncDataWriter(DataWriter(path / "stub_dat.ndt",
+                                                 path / "stub_dat.h5"))
+        self.action_abbreviations = {
+            "save_averages": lambda sim: sim.writer.save(sim)
         }
-        
-        target_list = []
-        
-        # Test 1: A simple string lookup
-        input_list_1 = [('averages', at('stage_end'))]
+
+    # SimulationSource, as read by the writer
+    def __getattr__(self, name):
+        if name in ('id', 'step', 'stage', 'stage_step', 'time',
+                    'stage_time', 'real_time'):
+            return self.clock[name]
+        raise AttributeError(name)
+
+    def get_subfield_average(self, subfieldname, mat_name=None):
+        return None
+
+    def get_materials_of_field(self, field_name):
+        return []
+
+    # Time integration
+    def do_next_stage(self, stage=None):
+        self.clock.stage = stage or self.clock.stage + 1
+        self.clock.stage_step = 0
+
+    def set_H_ext(self, H_ext):
+        pass
+
+    def reinitialise(self, initial_time=None):
+        pass
+
+    def is_converged(self):
+        return self.clock.step >= 10
+
+    def advance_time(self, target_time, max_it=-1):
+        steps = max_it if max_it > 0 else 1
+        self.clock.step += steps
+        self.clock.stage_step += steps
+        return 0.0
+
+    def read_steps(self):
+        with open(self.writer.ndt_filename) as f:
+            lines = [l.rstrip('\n') for l in f if not l.startswith('#')]
+        idx = lines[0].split('\t').index('step')
+        return [int(l.split('\t')[idx]) for l in lines[1:]]
+
+@pytest.fixture(scope="module")
+def predefined():
+    """Mock action functions, shared by all tests (never called)."""
+    return {
+        "save_averages": MagicMock(name="averages_func"),
+        "do_fields": MagicMock(name="fields_func"),
+        "do_next_stage": MagicMock(name="next_stage_func")
+    }
+
+def test_string_normalise():
+    """Tests the string normalization function."""
+    assert _string_normalise("save  fields") == "save_fields"
+    assert _string_normalise("Save_Fields") == "save_fields"
+    assert _string_normalise("Save_Fields", lower=False) == "Save_Fields"
+    assert _string_normalise("save fields", spaces=None) == "save fields"
+    assert _string_normalise(" save__fields ", spaces='-') == "-save-fields-"
+
+def test_append_x_list(predefined):
+    """Tests the logic for parsing 'save' and 'do' lists."""
+    mock_action_avg = predefined["save_averages"]
+    target_list = []
+
+    # Test 1: A simple string lookup
+    input_list_1 = [('averages', at('stage_end'))]
+    _append_x_list(
+        target_list,
+        input_list_1,
+        prefix="save",
+        predefined_actions=predefined
+    )
+    assert len(target_list) == 1
+    assert target_list[0][0] is mock_action_avg
+    assert isinstance(target_list[0][1], When)
+
+    # Test 2: A direct callable
+    my_func = lambda sim: "test"
+    input_list_2 = [(my_func, every('step', 10))]
+    _append_x_list(
+        target_list,
+        input_list_2,
+        prefix="save",
+        predefined_actions=predefined
+    )
+    assert len(target_list) == 2
+    assert target_list[1][0] is my_func
+
+    # Test 3: A multi-item tuple
+    target_list = []
+    input_list_3 = [('averages', my_func, at('convergence'))]
+    _append_x_list(
+        target_list,
+        input_list_3,
+        prefix="save",
+        predefined_actions=predefined
+    )
+    assert len(target_list) == 2
+    assert target_list[0][0] is mock_action_avg
+    assert target_list[1][0] is my_func
+
+    # Test 4: An invalid string
+    input_list_4 = [('invalid_string', at('stage_end'))]
+    with pytest.raises(ValueError, match="I don't know how to do it"):
         _append_x_list(
-            target_list, 
-            input_list_1, 
-            prefix="save", 
+            target_list,
+            input_list_4,
+            prefix="save",
             predefined_actions=predefined
         )
-        self.assertEqual(len(target_list), 1)
-        self.assertEqual(target_list[0][0], mock_action_avg)
-        self.assertIsInstance(target_list[0][1], When)
 
-        # Test 2: A direct callable
-        my_func = lambda sim: "test"
-        input_list_2 = [(my_func, every('step', 10))]
+    # Test 5: Bad syntax (not a list of tuples)
+    input_list_5 = None # type: ignore
+    with pytest.raises(ValueError, match="Bad syntax"):
         _append_x_list(
-            target_list, 
-            input_list_2, 
-            prefix="save", 
+            target_list,
+            input_list_5, # type: ignore
+            prefix="save",
             predefined_actions=predefined
         )
-        self.assertEqual(len(target_list), 2)
-        self.assertEqual(target_list[1][0], my_func)
 
-        # Test 3: A multi-item tuple
-        target_list = []
-        input_list_3 = [('averages', my_func, at('convergence'))]
-        _append_x_list(
-            target_list, 
-            input_list_3, 
-            prefix="save", 
-            predefined_actions=predefined
+def test_split_predefined():
+    """Tests that predefined actions are grouped by prefix."""
+    avg, nxt = MagicMock(), MagicMock()
+    split = _split_predefined({
+        "save_averages": avg,
+        "do_next_stage": nxt,
+        "noprefix": MagicMock()
+    })
+    assert split == {
+        "save": {"averages": avg},
+        "do": {"next_stage": nxt}
+    }
+
+def test_join_save_and_do_lists(predefined):
+    """Tests that 'do' actions are ordered before 'save' actions."""
+    save_list = [('averages', at('stage_end'))]
+    do_list = [('next_stage', at('convergence'))]
+
+    joint_list = _join_save_and_do_lists(save_list, do_list, predefined)
+
+    assert len(joint_list) == 2
+    # Check that the 'do' item is first
+    assert joint_list[0][0] is predefined["do_next_stage"]
+    # Check that the 'save' item is second
+    assert joint_list[1][0] is predefined["save_averages"]
+
+def test_hysteresis_flushes_the_writer(tmp_path):
+    """The .ndt holds all the rows as soon as the loop returns."""
+    sim = StubSimulation(tmp_path)
+    simulation_hysteresis(
+        sim, [None],
+        save=[('averages', every('step', 5) | at('stage_end'))]
+    )
+    assert sim.read_steps() == [0, 5, 10]
+    sim.writer.close()
+
+def test_hysteresis_flushes_the_writer_every_stage(tmp_path):
+    """The rows of a stage are in the .ndt when the next stage starts."""
+    seen = []
+    def record(sim):
+        if not seen:
+            seen.append(sim.read_steps())
+
+    sim = StubSimulation(tmp_path)
+    simulation_hysteresis(
+        sim, [None, None],
+        save=[('averages', every('step', 5) | at('stage_end'))],
+        do=[(record, at('stage', 2))]
+    )
+    assert seen == [[0, 5, 10]]
+    sim.writer.close()
+
+def test_hysteresis_flushes_the_writer_on_exit(tmp_path):
+    """Leaving through clock.exit_hysteresis flushes the writer too."""
+    def stop(sim):
+        sim.clock.exit_hysteresis = sim.clock.stage_end = True
+
+    sim = StubSimulation(tmp_path)
+    simulation_hysteresis(
+        sim, [None, None],
+        save=[('averages', every('step', 5))],
+        do=[(stop, at('step', 5))]
+    )
+    assert sim.read_steps() == [0, 5]
+    sim.writer.close()
+
+def test_hysteresis_error_is_not_hidden_by_flush(tmp_path):
+    """An error in a stage propagates even if flushing fails as well."""
+    def fail(sim):
+        raise ValueError("stage failed")
+    def flush():
+        raise RuntimeError("writer failed")
+
+    sim = StubSimulation(tmp_path)
+    sim.writer.flush = flush
+    with pytest.raises(ValueError, match="stage failed"):
+        simulation_hysteresis(
+            sim, [None],
+            save=[('averages', every('step', 5))],
+            do=[(fail, at('step', 5))]
         )
-        self.assertEqual(len(target_list), 2)
-        self.assertEqual(target_list[0][0], mock_action_avg)
-        self.assertEqual(target_list[1][0], my_func)
-
-        # Test 4: An invalid string
-        input_list_4 = [('invalid_string', at('stage_end'))]
-        with self.assertRaises(ValueError) as cm:
-            _append_x_list(
-                target_list, 
-                input_list_4, 
-                prefix="save", 
-                predefined_actions=predefined
-            )
-            self.assertIn("I don't know how to do it", str(cm.exception))
-
-        # Test 5: Bad syntax (not a list of tuples)
-        input_list_5 = None # type: ignore
-        with self.assertRaises(ValueError) as cm:
-            _append_x_list(
-                target_list, 
-                input_list_5, # type: ignore
-                prefix="save", 
-                predefined_actions=predefined
-            )
-        self.assertIn("Bad syntax", str(cm.exception))
-
-
-    def test_join_save_and_do_lists(self):
-        """Tests that 'do' actions are ordered before 'save' actions."""
-        mock_do = MagicMock(name="do_func")
-        mock_save = MagicMock(name="save_func")
-        
-        predefined = {
-            "do_next_stage": mock_do,
-            "save_averages": mock_save
-        }
+    sim.writer.close()
 
-        save_list = [('averages', at('stage_end'))]
-        do_list = [('next_stage', at('convergence'))]
-        
-        joint_list = _join_save_and_do_lists(save_list, do_list, predefined)
-        
-        self.assertEqual(len(joint_list), 2)
-        # Check that the 'do' item is first
-        self.assertEqual(joint_list[0][0], mock_do)
-        # Check that the 'save' item is second
-        self.assertEqual(joint_list[1][0], mock_save)
-
-    # Tests for _update_progress_file, _next_deltas, _next_time,
-    # and simulation_hysteresis will be added as integration tests
-    # once the Simulation class is available, as they all
-    # depend heavily on the 'sim' object.
-
-if __name__ == '__main__':
-    unittest.main()
+# Tests for _update_progress_file, _next_deltas, _next_time,
+# and simulation_hysteresis will be added as integration tests
+# once the Simulation class is available, as they all
+# depend heavily on the 'sim' object.
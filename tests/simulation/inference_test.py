@@ -77,6 +77,22 @@ def test_invalidation(basic_engine, build_tracker):
     basic_engine.make("target", tracker=build_tracker)
     assert len(build_tracker) == 2
 
+def test_shared_dependency_is_built_once(build_tracker):
+    """Verify the build order on a diamond A <- B, C <- D."""
+    def step(name):
+        return lambda **kwargs: kwargs['tracker'].append(name)
+
+    rules = [
+        {"name": "A", "how_to_make": [step("A")]},
+        {"name": "B", "depends_on": ["A"], "how_to_make": [step("B")]},
+        {"name": "C", "depends_on": ["A"], "how_to_make": [step("C")]},
+        {"name": "D", "depends_on": ["B", "C"], "how_to_make": [step("D")]},
+    ]
+    engine = InferenceEngine(rules)
+    engine.make("D", tracker=build_tracker)
+
+    assert build_tracker == ["A", "B", "C", "D"]
+
 def test_missing_dependency_error():
     """Verify that the engine raises KeyError for missing nodes."""
     rules = [{"name": "A", "depends_on": ["NON_EXISTENT"]}]
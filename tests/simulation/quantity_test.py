@@ -77,5 +77,25 @@ class TestQuantity(unittest.TestCase):
         # Test that the *processed* signature was inherited
         self.assertEqual(child_q.signature, parent_q.signature)
 
+    def test_sub_quantity_is_cached(self):
+        """Test that sub_quantity returns the same object for the same name."""
+        parent_q = Quantity(name="m", type="pfield", units=SI(1))
+
+        self.assertIs(parent_q.sub_quantity("m_Py_0"),
+                      parent_q.sub_quantity("m_Py_0"))
+        self.assertIsNot(parent_q.sub_quantity("m_Py_0"),
+                         parent_q.sub_quantity("m_Py_1"))
+
+    def test_units_str_is_cached(self):
+        """Test that the dense units string is computed at construction."""
+        q = Quantity(name="H_ext", type="field", units=self.unit_A_m)
+        self.assertEqual(q.units_str, self.unit_A_m.dens_str())
+
+        child_q = q.sub_quantity(name="H_ext_0")
+        self.assertEqual(child_q.units_str, q.units_str)
+
+        q_no_units = Quantity(name="localtime", type="date", units=None)
+        self.assertEqual(q_no_units.units_str, "-")
+
 if __name__ == '__main__':
     unittest.main()
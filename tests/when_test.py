@@ -1,22 +1,32 @@
+import math
+import random
 import unittest
+from types import MappingProxyType
 from when import at, every, never, TimeDict
+from when.when import (
+    _DELTA_NOT_POSITIVE_MSG, _LAST_NOT_AFTER_FIRST_MSG, _NO_IDENTIFIER_MSG,
+    _AndSpec, _EverySpec, _OrSpec, When
+)
 from typing import Any
 
 # --- Unit Tests (unittest.TestCase format) ---
 
 class TestTimeSpec(unittest.TestCase):
 
+    # Read-only, every test works on its own copy (see setUp).
+    _TIME_TEMPLATE = MappingProxyType({
+        'stage': 0,
+        'step': 0,
+        'time': 0.0,
+        'stage_step': 0,
+        'stage_time': 0.0,
+        'real_time': 0.0,
+        'convergence': False
+    })
+
     def setUp(self):
         """Provides a base time dictionary for each test."""
-        self.time: TimeDict = {
-            'stage': 0,
-            'step': 0,
-            'time': 0.0,
-            'stage_step': 0,
-            'stage_time': 0.0,
-            'real_time': 0.0,
-            'convergence': False
-        }
+        self.time: TimeDict = dict(self._TIME_TEMPLATE)
 
     def test_at(self):
         w_step = at('step', 10)
@@ -109,17 +119,27 @@ class TestTimeSpec(unittest.TestCase):
         self.assertIs(w.next_time('step', self.time), False)
 
     def test_every_validation(self):
-        with self.assertRaisesRegex(ValueError, "delta must be positive"):
+        with self.assertRaises(ValueError) as cm:
             every('step', 0)
+        self.assertIn(_DELTA_NOT_POSITIVE_MSG, str(cm.exception))
         
-        with self.assertRaisesRegex(ValueError, "delta must be positive"):
+        with self.assertRaises(ValueError) as cm:
             every('step', -1)
+        self.assertIn(_DELTA_NOT_POSITIVE_MSG, str(cm.exception))
+        message = str(cm.exception)
+
+        # The specification checks delta too, with the same message.
+        with self.assertRaises(ValueError) as cm:
+            _EverySpec('step', -1, 0.0, None)
+        self.assertEqual(str(cm.exception), message)
 
-        with self.assertRaisesRegex(ValueError, "'last' must be greater than 'first'"):
+        with self.assertRaises(ValueError) as cm:
             every('step', 10, first=10, last=10)
+        self.assertIn(_LAST_NOT_AFTER_FIRST_MSG, str(cm.exception))
             
-        with self.assertRaisesRegex(ValueError, "must specify an identifier"):
+        with self.assertRaises(ValueError) as cm:
             every(10, 20)
+        self.assertEqual(str(cm.exception), _NO_IDENTIFIER_MSG)
 
     def test_never(self):
         w = never
@@ -131,6 +151,14 @@ class TestTimeSpec(unittest.TestCase):
         self.assertFalse(w.match_time(self.time))
         self.assertIs(w.next_time('step', self.time), False)
 
+    def test_never_collapses(self):
+        w = every('step', 10)
+        self.assertIs(never | w, w)
+        self.assertIs(w | never, w)
+        self.assertIs(w | w, w)
+        self.assertIs(never & w, never)
+        self.assertIs(w & never, never)
+
     def test_or(self):
         w = at('step', 5) | at('step', 10)
         
@@ -170,6 +198,147 @@ class TestTimeSpec(unittest.TestCase):
         self.time['step'] = 30
         self.assertTrue(w.match_time(self.time))
         self.assertEqual(w.next_time('step', self.time), 60)
+        # The candidate times tried on the way are not left behind.
+        self.assertEqual(self.time['step'], 30)
+
+    def test_and_checks_every_operand(self):
+        # The 'or' proposes step 2 through its inner 'and', which does not
+        # match there (stage is 1), so the first common match is step 4.
+        w = (every('step', 4) | (every('step', 2) & at('stage', 0))) & every('step', 2)
+        self.time['stage'] = 1
+        self.time['step'] = 0
+        nt = w.next_time('step', self.time)
+        self.assertEqual(nt, 4)
+        self.time['step'] = nt
+        self.assertTrue(w.match_time(self.time))
+
+    def test_chains_are_flattened(self):
+        w = at('step', 5) | at('step', 10) | every('step', 4, first=20)
+        self.assertEqual(str(w), "(at('step', 5) | at('step', 10) | every(4, 'step', first=20))")
+
+        self.time['step'] = 6
+        self.assertEqual(w.next_time('step', self.time), 10)
+        self.time['step'] = 10
+        self.assertEqual(w.next_time('step', self.time), 20)
+
+        # An 'and' chain is flattened from the left only, since the
+        # grouping can change its next time.
+        a = every('step', 1, first=1)
+        b = at('convergence')
+        c = every('step', 3, first=10)
+        self.assertEqual(len((a & b & c).spec.specs), 3)
+        self.assertEqual(len((a & (b & c)).spec.specs), 2)
+        self.time['convergence'] = True
+        self.time['step'] = 0
+        self.assertEqual((a & b & c).next_time('step', self.time), 10)
+
+    def test_and_grouping(self):
+        # Both give a step which does not match: an operand which does not
+        # constrain the step (True) leaves the decision to the other one.
+        w = every('step', 5, first=2) | (
+            (at('stage', 1) & every('step', 3, first=2))
+            & every('step', 2, last=30))
+        self.time['step'] = 7
+        self.assertEqual(w.next_time('step', self.time), 12)
+
+        w = (at('stage', 0) & every('step', 2, last=20)) & at('step', 12)
+        self.time['stage'] = 1
+        self.time['step'] = 0
+        self.assertIs(w.next_time('step', self.time), False)
+
+    def test_flattening_keeps_next_time(self):
+        # Chains of binary nodes, as built without flattening, give the
+        # same next times as the flattened ones.
+        rng = random.Random(1234)
+
+        def random_spec(depth=0):
+            if depth < 3 and rng.random() < 0.45:
+                (w1, s1), (w2, s2) = random_spec(depth + 1), random_spec(depth + 1)
+                if rng.random() < 0.4:
+                    return w1 | w2, _OrSpec(s1, s2)
+                return w1 & w2, _AndSpec(s1, s2)
+            identifier = rng.choice(['step', 'step', 'stage'])
+            if rng.random() < 0.3:
+                w = at(identifier, rng.randint(0, 40))
+            else:
+                first = rng.choice([0, 1, 2, 4, 10])
+                w = every(identifier, rng.choice([None, 1, 2, 3, 4, 5, 6]),
+                          first=first,
+                          last=rng.choice([None, first + 10, first + 60]))
+            return w, w.spec
+
+        def outcome(w, time):
+            try:
+                return w.next_time('step', dict(time))
+            except RuntimeError:
+                return RuntimeError
+
+        for _ in range(2000):
+            w, binary = random_spec()
+            time = {'step': rng.randint(0, 30), 'stage': rng.randint(0, 3)}
+            with self.subTest(spec=str(w), time=time):
+                expected = outcome(When(binary), time)
+                nt = outcome(w, time)
+                self.assertEqual(nt, expected)
+                self.assertIs(type(nt), type(expected))
+
+    def test_and_mutually_exclusive(self):
+        w = every('step', 2) & every('step', 2, first=1)
+
+        self.time['step'] = 0
+        with self.assertRaisesRegex(RuntimeError, "mutually exclusive"):
+            w.next_time('step', self.time)
+        self.assertEqual(self.time['step'], 0)
+
+        # With a 'last' the conditions just stop matching.
+        w = every('step', 2, last=100) & every('step', 2, first=1)
+        self.assertIs(w.next_time('step', self.time), False)
+
+    def test_and_long_search(self):
+        # Coprime periods only meet at their lcm, far into the search.
+        w = every('step', 2000) & every('step', 2001)
+        self.time['step'] = 0
+        self.assertEqual(w.next_time('step', self.time), 2000 * 2001)
+
+    def test_match_time_array(self):
+        w = (every('step', 5, first=10, last=40) | at('step', 3)) & at('convergence')
+        steps = list(range(50))
+
+        self.time['convergence'] = True
+        expected = []
+        for step in steps:
+            self.time['step'] = step
+            expected.append(w.match_time(self.time))
+        mask = w.match_time_array('step', steps, self.time)
+        self.assertEqual(mask.tolist(), expected)
+
+        self.time['convergence'] = False
+        self.assertFalse(w.match_time_array('step', steps, self.time).any())
+
+        times = [0.1 * i for i in range(100)]
+        mask = every('time', 0.3).match_time_array('time', times)
+        self.assertEqual(mask.nonzero()[0].tolist(), list(range(0, 100, 3)))
+
+    def test_next_time_array(self):
+        w = every('step', 2, last=21) & every('step', 4, first=10) | at('step', 15)
+        self.assertEqual(w.next_time_array('step', [0, 10, 14, 15, 18]).tolist(),
+                         [10, 14, 15, 18, math.inf])
+
+        w = every('time', 100.0) | every('time', 30.0)
+        times = [0.0, 30.0, 60.0, 90.0, 100.0, 120.0]
+        self.assertEqual(
+            w.next_time_array('time', times, tols={'time': 1e-9}).tolist(),
+            [30.0, 60.0, 90.0, 100.0, 120.0, 150.0]
+        )
+
+        # True (the identifier is not constrained) is -inf
+        w = every('step', 5, last=20) | every('stage', 2)
+        self.time['stage'] = 2
+        self.assertEqual(w.next_time_array('step', [3, 25], self.time).tolist(),
+                         [-math.inf, -math.inf])
+        self.time['stage'] = 1
+        self.assertEqual(w.next_time_array('step', [3, 25], self.time).tolist(),
+                         [5, math.inf])
 
     def test_repr(self):
         w1 = at('convergence')
@@ -215,6 +384,18 @@ class TestTimeSpec(unittest.TestCase):
         # With tol, result is the same
         self.assertEqual(w.next_time('step', self.time, tols), 20.0)
 
+    def test_tols_ignored_for_bool_next_time(self):
+        # True/False are not times: the tolerance, which may not even be
+        # comparable with 0.0 (as the SI ones used by hysteresis), is not
+        # looked at.
+        class Incomparable:
+            def __le__(self, other):
+                raise ValueError("not comparable")
+
+        w = at('stage_end')
+        tols = {'time': Incomparable()}
+        self.assertIs(w.next_time('time', self.time, tols), True)
+
     # --- Integration Tests (from original __main__) ---
 
     def test_main_integration_loop(self):